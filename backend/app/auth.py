@@ -3,19 +3,37 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from app import models
 from app.database import get_db
+from app.services.cache_service import MemoryBackend
+from sqlalchemy import event
 from sqlalchemy.orm import Session
+import asyncio
+import os
+import time
 
 # === CONFIG ===
 SECRET_KEY = "change-this-to-a-strong-secret-in-production-1234567890"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Verified principals are cached per token so authenticated requests skip
+# both JWT verification and the users lookup
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+# bcrypt is CPU-bound (~100ms at the default cost), so async routes run it on
+# a small dedicated pool instead of the event loop
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+_password_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")  # ← this is correct
+_principal_cache = MemoryBackend(PRINCIPAL_CACHE_MAX_ENTRIES)
 
 # === FUNCTIONS ===
 def get_password_hash(password: str) -> str:
@@ -24,27 +42,92 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_hash_pool, get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_hash_pool, verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+class Principal:
+    """Verified identity from a bearer token; enough for ownership checks"""
+
+    __slots__ = ("id", "username")
+
+    def __init__(self, id: int, username: str):
+        self.id = id
+        self.username = username
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _user_version_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def invalidate_user(user_id: int):
+    """Drop every cached principal for this user (all of their tokens)"""
+    _principal_cache.incr_version(_user_version_key(user_id))
+
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Resolve the token to a Principal. A cold cache costs one users lookup
+    (by primary key when the token has a uid claim), so deleted users lose
+    access and renames show up once their cached entry is invalidated"""
+    cached = _principal_cache.get(token)
+    if cached is not None:
+        principal, user_version = cached
+        if user_version == _principal_cache.get_version(_user_version_key(principal.id)):
+            return principal
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
 
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user_id = payload.get("uid")
+    # Read the version before the lookup so a delete racing with it isn't cached over
+    user_version = _principal_cache.get_version(_user_version_key(user_id)) if user_id is not None else None
+    if user_id is not None:
+        row = db.query(models.User.id, models.User.username).filter(models.User.id == user_id).first()
+    else:
+        # Tokens issued before the uid claim existed
+        row = db.query(models.User.id, models.User.username).filter(models.User.username == username).first()
+    if row is None:
+        raise _credentials_exception()
+    user_id = row.id
+
+    principal = Principal(id=user_id, username=row.username)
+    ttl = min(PRINCIPAL_CACHE_TTL_SECONDS, int(payload["exp"] - time.time()))
+    if ttl > 0:
+        if user_version is None:
+            user_version = _principal_cache.get_version(_user_version_key(user_id))
+        _principal_cache.set(token, (principal, user_version), ttl)
+    return principal
+
+def get_current_user(principal: Principal = Depends(get_current_principal), db: Session = Depends(get_db)):
+    """Full User row, for routes that need more than the id"""
+    user = db.query(models.User).filter(models.User.id == principal.id).first()
     if user is None:
-        raise credentials_exception
+        invalidate_user(principal.id)
+        raise _credentials_exception()
     return user
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, user):
+    invalidate_user(user.id)
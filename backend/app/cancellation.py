@@ -0,0 +1,132 @@
+# backend/app/cancellation.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Header, Request
+
+# === CONFIG ===
+# Hard ceiling for LLM work in one request (Vercel kills functions at 60s)
+LLM_REQUEST_DEADLINE_SECONDS = float(os.getenv("LLM_REQUEST_DEADLINE_SECONDS", "55"))
+DISCONNECT_POLL_SECONDS = 0.5
+# How often blocked threads re-check their token
+_WAIT_SLICE_SECONDS = 0.25
+
+
+class Cancelled(Exception):
+    """The request's LLM work was cancelled (client gone or deadline hit)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancellationToken:
+    """Thread-safe cancel flag plus an optional monotonic deadline"""
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self._event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    def wait_slice(self) -> float:
+        remaining = self.remaining()
+        return _WAIT_SLICE_SECONDS if remaining is None else max(0.0, min(_WAIT_SLICE_SECONDS, remaining))
+
+    def wait_for(self, future):
+        """future.result(), giving up as soon as the token is cancelled.
+
+        The future itself is left running; callers own its cleanup.
+        """
+        while True:
+            self.raise_if_cancelled()
+            try:
+                return future.result(timeout=self.wait_slice())
+            except FutureTimeout:
+                continue
+
+    def wait_first(self, futures, timeout: Optional[float] = None) -> set:
+        """Futures from `futures` that are done once any is, or an empty set
+        if `timeout` passes first. Raises Cancelled like wait_for().
+        """
+        give_up = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.raise_if_cancelled()
+            slice_seconds = self.wait_slice()
+            if give_up is not None:
+                slice_seconds = min(slice_seconds, max(0.0, give_up - time.monotonic()))
+            done, _ = wait(futures, timeout=slice_seconds, return_when=FIRST_COMPLETED)
+            if done:
+                return done
+            if give_up is not None and time.monotonic() >= give_up:
+                return set()
+
+
+# A token that is never cancelled, for work outside a request
+NEVER = CancellationToken()
+
+_current_token: ContextVar[CancellationToken] = ContextVar("cancellation_token", default=NEVER)
+
+
+def current() -> CancellationToken:
+    return _current_token.get()
+
+
+@contextmanager
+def scope(token: CancellationToken):
+    """Make `token` govern llm_service calls made inside the block"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+# === FASTAPI DEPENDENCY ===
+async def request_cancellation(request: Request, x_deadline_seconds: Optional[float] = Header(None)):
+    """Token cancelled when the client disconnects or the request deadline passes.
+
+    Clients may ask for a shorter deadline with X-Deadline-Seconds.
+    """
+    seconds = LLM_REQUEST_DEADLINE_SECONDS
+    if x_deadline_seconds is not None and x_deadline_seconds > 0:
+        seconds = min(seconds, x_deadline_seconds)
+    token = CancellationToken(deadline=time.monotonic() + seconds)
+
+    async def watch_disconnect():
+        while not token.cancelled:
+            if await request.is_disconnected():
+                token.cancel("client disconnected")
+                return
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        yield token
+    finally:
+        watcher.cancel()
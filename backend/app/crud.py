@@ -1,43 +1,26 @@
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from app import models, schemas
-from app.auth import get_password_hash
-from sqlalchemy import text
+from app.services import cache_service
+from sqlalchemy import and_, case, or_, text, func
+from datetime import datetime
 
 # User CRUD
-def create_user(db: Session, user: schemas.UserCreate):
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
+    """Insert a user; the caller hashes the password and checks uniqueness
+    (the unique constraints still catch races, which return None)"""
     print(f"=== CREATE USER START ===")
     print(f"Username: {user.username}")
     print(f"Email: {user.email}")
     
     try:
-        # Check if user already exists
-        existing_user = get_user_by_email(db, user.email)
-        if existing_user:
-            print(f"User with email {user.email} already exists")
-            return None
-            
-        existing_username = get_user_by_username(db, user.username)
-        if existing_username:
-            print(f"User with username {user.username} already exists")
-            return None
-        
-        hashed_password = get_password_hash(user.password)
-        print(f"Password hashed successfully")
-        
         db_user = models.User(
             email=user.email,
             username=user.username,
             hashed_password=hashed_password
         )
-        print(f"User model created")
-        
         db.add(db_user)
-        print(f"User added to session")
-        
         db.commit()
-        print(f"Committed to database")
-        
         db.refresh(db_user)
         print(f"User created with ID: {db_user.id}")
         print(f"=== CREATE USER SUCCESS ===")
@@ -63,6 +46,12 @@ def create_user(db: Session, user: schemas.UserCreate):
         db.rollback()
         return None
 
+def get_users_by_username_or_email(db: Session, username: str, email: str):
+    """Single round trip for the register uniqueness check"""
+    return db.query(models.User).filter(
+        or_(models.User.username == username, models.User.email == email)
+    ).all()
+
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
@@ -90,9 +79,49 @@ def create_project(db: Session, project: schemas.ProjectCreate, user_id: int):
         db.rollback()
         return None
 
+def create_imported_project(db: Session, user_id: int, title: str, document_type: str, sections, batch_size: int = 50):
+    """Create a project from an iterator of (title, content) pairs.
+
+    Sections are flushed in batches as they arrive so only one batch is held
+    in memory; the project appears in a single commit.
+    """
+    try:
+        db_project = models.Project(user_id=user_id, title=title, document_type=document_type, topic=title)
+        db.add(db_project)
+        db.flush()
+
+        titles, batch = [], []
+        for section_title, content in sections:
+            batch.append(models.Section(
+                project_id=db_project.id, title=section_title, content=content or None, position=len(titles),
+                generation_status="done" if content else "pending"
+            ))
+            titles.append(section_title)
+            if len(batch) >= batch_size:
+                db.add_all(batch)
+                db.flush()
+                batch = []
+        db.add_all(batch)
+
+        db_project.structure = {"sections": titles}
+        db.commit()
+        db.refresh(db_project)
+        return db_project
+    except SQLAlchemyError:
+        db.rollback()
+        return None
+
 def get_user_projects(db: Session, user_id: int):
     return db.query(models.Project).filter(models.Project.user_id == user_id).all()
 
+def get_user_projects_fingerprint(db: Session, user_id: int):
+    """(count, latest updated_at, highest id) of a user's projects; changes whenever the list does"""
+    return db.query(
+        func.count(models.Project.id),
+        func.max(models.Project.updated_at),
+        func.max(models.Project.id)
+    ).filter(models.Project.user_id == user_id).one()
+
 def get_project(db: Session, project_id: int, user_id: int):
     return db.query(models.Project).filter(
         models.Project.id == project_id,
@@ -110,6 +139,7 @@ def update_project(db: Session, project_id: int, user_id: int, project_update: s
             setattr(project, field, value)
             
         db.commit()
+        cache_service.invalidate_project(project_id)
         db.refresh(project)
         return project
     except SQLAlchemyError:
@@ -122,6 +152,7 @@ def delete_project(db: Session, project_id: int, user_id: int):
         if project:
             db.delete(project)
             db.commit()
+            cache_service.invalidate_project(project_id)
             return True
         return False
     except SQLAlchemyError:
@@ -129,33 +160,142 @@ def delete_project(db: Session, project_id: int, user_id: int):
         return False
 
 # Section CRUD - FIXED VERSION (without order parameter)
-def create_section(db: Session, project_id: int, title: str):
+def create_section(db: Session, project_id: int, title: str, position: int = None):
     try:
         db_section = models.Section(
             project_id=project_id,
-            title=title
-            # section_order=section_order
+            title=title,
+            position=position
         )
         db.add(db_section)
         db.commit()
+        cache_service.invalidate_project(project_id)
         db.refresh(db_section)
         return db_section
     except SQLAlchemyError:
         db.rollback()
         return None
 
-def update_section_content(db: Session, section_id: int, content: str):
+def create_sections(db: Session, project_id: int, titles: list, pregenerated: bool = False):
+    """Create one section per outline title in a single commit"""
+    try:
+        db_sections = [
+            models.Section(project_id=project_id, title=title, position=position, pregenerated=pregenerated)
+            for position, title in enumerate(titles)
+        ]
+        db.add_all(db_sections)
+        db.commit()
+        cache_service.invalidate_project(project_id)
+        return db_sections
+    except SQLAlchemyError:
+        db.rollback()
+        return None
+
+def rebuild_pregenerated_sections(db: Session, project_id: int, titles: list) -> int:
+    """Replace untouched pre-generated sections with fresh ones for `titles`.
+
+    Sections the user generated, refined or rated are kept and moved to their
+    title's place in the new outline (after it, if the title was dropped);
+    titles they cover aren't recreated. Returns how many sections were dropped.
+    """
+    try:
+        sections = sorted(
+            db.query(models.Section).filter(models.Section.project_id == project_id).all(),
+            key=models.section_order
+        )
+        stale = [s for s in sections if s.pregenerated]
+        if not stale:
+            return 0
+        for section in stale:
+            db.delete(section)
+
+        kept = {}
+        for section in sections:
+            if not section.pregenerated:
+                kept.setdefault(section.title, []).append(section)
+        for position, title in enumerate(titles):
+            if kept.get(title):
+                kept[title].pop(0).position = position
+            else:
+                db.add(models.Section(project_id=project_id, title=title, position=position, pregenerated=True))
+        leftovers = sorted((s for group in kept.values() for s in group), key=models.section_order)
+        for offset, section in enumerate(leftovers):
+            section.position = len(titles) + offset
+        db.commit()
+        cache_service.invalidate_project(project_id)
+        return len(stale)
+    except SQLAlchemyError:
+        db.rollback()
+        return 0
+
+def update_section_content(db: Session, section_id: int, content: str, pregenerated: bool = False):
     try:
         section = db.query(models.Section).filter(models.Section.id == section_id).first()
         if section:
             section.content = content
+            section.pregenerated = pregenerated
+            section.generation_status = "done" if content else "pending"
+            section.generation_error = None
+            project_id = section.project_id
             db.commit()
+            cache_service.invalidate_project(project_id)
             db.refresh(section)
         return section
     except SQLAlchemyError:
         db.rollback()
         return None
 
+# Section generation state
+def claim_section_generation(db: Session, section_id: int, stale_before: datetime, force: bool = False) -> bool:
+    """Atomically mark a section running and count the attempt.
+
+    Only pending/failed sections (or 'running' ones whose worker started
+    before `stale_before` and presumably died) can be claimed, unless
+    `force`. Returns False if someone else holds it or it is already done.
+    """
+    try:
+        query = db.query(models.Section).filter(models.Section.id == section_id)
+        if not force:
+            query = query.filter(or_(
+                models.Section.generation_status.in_(("pending", "failed")),
+                and_(models.Section.generation_status.is_(None), models.Section.content.is_(None)),
+                and_(models.Section.generation_status == "running", models.Section.generation_started_at < stale_before),
+            ))
+        claimed = query.update({
+            models.Section.generation_status: "running",
+            # Attempts count consecutive tries; a regeneration of finished content starts over
+            models.Section.generation_attempts: case(
+                (models.Section.generation_status == "done", 1),
+                else_=models.Section.generation_attempts + 1
+            ),
+            models.Section.generation_error: None,
+            models.Section.generation_started_at: datetime.utcnow(),
+            models.Section.updated_at: datetime.utcnow(),
+        }, synchronize_session="fetch")
+        db.commit()
+        if claimed:
+            project_id = db.query(models.Section.project_id).filter(models.Section.id == section_id).scalar()
+            cache_service.invalidate_project(project_id)
+        return bool(claimed)
+    except SQLAlchemyError:
+        db.rollback()
+        return False
+
+def finish_section_generation(db: Session, section_id: int, status: str, error: str = None):
+    """Record a generation that did not produce content ('failed', or back to 'pending' if cancelled)"""
+    try:
+        section = db.query(models.Section).filter(models.Section.id == section_id).first()
+        if section:
+            section.generation_status = status
+            section.generation_error = error[:2000] if error else None
+            project_id = section.project_id
+            db.commit()
+            cache_service.invalidate_project(project_id)
+        return section
+    except SQLAlchemyError:
+        db.rollback()
+        return None
+
 def get_section(db: Session, section_id: int):
     return db.query(models.Section).filter(models.Section.id == section_id).first()
 
@@ -171,8 +311,15 @@ def update_section(db: Session, section_id: int, section_update: schemas.Section
         update_data = section_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(section, field, value)
+        if "content" in update_data:
+            # Hand-written content counts as finished
+            section.generation_status = "done" if section.content else "pending"
+            section.generation_error = None
+            section.pregenerated = False
             
+        project_id = section.project_id
         db.commit()
+        cache_service.invalidate_project(project_id)
         db.refresh(section)
         return section
     except SQLAlchemyError:
@@ -208,6 +355,10 @@ def create_feedback(db: Session, feedback: schemas.FeedbackCreate):
             comment=feedback.comment
         )
         db.add(db_feedback)
+        # Rated content is the user's now; outline edits leave it alone
+        db.query(models.Section).filter(models.Section.id == feedback.section_id).update(
+            {models.Section.pregenerated: False}, synchronize_session=False
+        )
         db.commit()
         db.refresh(db_feedback)
         return db_feedback
@@ -217,3 +368,140 @@ def create_feedback(db: Session, feedback: schemas.FeedbackCreate):
 
 def get_section_feedbacks(db: Session, section_id: int):
     return db.query(models.Feedback).filter(models.Feedback.section_id == section_id).order_by(models.Feedback.created_at.desc()).all()
+
+
+# LLM usage CRUD
+def create_llm_usage_records(db: Session, user_id: int, project_id, section_id, records: list):
+    try:
+        db.add_all([
+            models.LLMUsage(user_id=user_id, project_id=project_id, section_id=section_id, **record)
+            for record in records
+        ])
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+
+def apply_bulk_refinement(db: Session, user_id: int, project_id: int, prompt: str, results: list):
+    """Write a bulk refinement in one transaction.
+
+    `results` holds dicts with section_id, old_content, new_content (None if
+    the call failed) and usage records. Usage is always recorded; content and
+    Refinement rows only for sections still holding old_content. Returns the
+    ids of the sections that were updated, or None if the transaction failed.
+    """
+    try:
+        ids = [result["section_id"] for result in results]
+        sections = {
+            section.id: section
+            for section in db.query(models.Section).filter(models.Section.id.in_(ids)).with_for_update().populate_existing()
+        }
+        applied = []
+        for result in results:
+            db.add_all([
+                models.LLMUsage(user_id=user_id, project_id=project_id, section_id=result["section_id"], **record)
+                for record in result["usage"]
+            ])
+            section = sections.get(result["section_id"])
+            if result["new_content"] is None or section is None or section.content != result["old_content"]:
+                continue
+            db.add(models.Refinement(
+                section_id=section.id,
+                prompt=prompt,
+                old_content=result["old_content"],
+                new_content=result["new_content"]
+            ))
+            section.content = result["new_content"]
+            section.pregenerated = False
+            applied.append(section.id)
+        db.commit()
+        cache_service.invalidate_project(project_id)
+        return applied
+    except SQLAlchemyError:
+        db.rollback()
+        return None
+
+def get_user_tokens_since(db: Session, user_id: int, since: datetime) -> int:
+    total = db.query(
+        func.coalesce(func.sum(models.LLMUsage.prompt_tokens + models.LLMUsage.output_tokens), 0)
+    ).filter(
+        models.LLMUsage.user_id == user_id,
+        models.LLMUsage.created_at >= since
+    ).scalar()
+    return int(total)
+
+def get_llm_quota(db: Session, user_id: int):
+    return db.query(models.LLMQuota).filter(models.LLMQuota.user_id == user_id).first()
+
+def get_llm_usage_summary(db: Session, user_id: int, since: datetime, group_by=None, project_id: int = None):
+    """Aggregate usage rows; one row per group_by value (or a single total row)"""
+    columns = [
+        func.count(models.LLMUsage.id).label("calls"),
+        func.coalesce(func.sum(models.LLMUsage.prompt_tokens), 0).label("prompt_tokens"),
+        func.coalesce(func.sum(models.LLMUsage.output_tokens), 0).label("output_tokens"),
+        func.coalesce(func.avg(models.LLMUsage.latency_ms), 0).label("avg_latency_ms"),
+        func.coalesce(func.max(models.LLMUsage.latency_ms), 0).label("max_latency_ms"),
+        func.count(models.LLMUsage.id).filter(models.LLMUsage.cache_status == "hit").label("cache_hits"),
+        func.count(models.LLMUsage.id).filter(models.LLMUsage.success.is_(False)).label("failures"),
+    ]
+    if group_by is not None:
+        columns.insert(0, group_by.label("key"))
+
+    query = db.query(*columns).filter(
+        models.LLMUsage.user_id == user_id,
+        models.LLMUsage.created_at >= since
+    )
+    if project_id is not None:
+        query = query.filter(models.LLMUsage.project_id == project_id)
+    if group_by is not None:
+        query = query.group_by(group_by).order_by(group_by)
+    return query.all()
+
+
+# Idempotency key CRUD
+def get_idempotency_key(db: Session, user_id: int, key: str):
+    return db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.key == key
+    ).first()
+
+def create_idempotency_key(db: Session, user_id: int, key: str, endpoint: str, request_hash: str, expires_at: datetime):
+    """Claim a key; returns None if another request claimed it first"""
+    try:
+        record = models.IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            endpoint=endpoint,
+            request_hash=request_hash,
+            status="in_progress",
+            expires_at=expires_at
+        )
+        db.add(record)
+        db.commit()
+        db.refresh(record)
+        return record
+    except IntegrityError:
+        db.rollback()
+        return None
+
+def complete_idempotency_key(db: Session, record: models.IdempotencyKey, response_code: int, response_body):
+    try:
+        record.status = "completed"
+        record.response_code = response_code
+        record.response_body = response_body
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+
+def delete_idempotency_key(db: Session, record: models.IdempotencyKey):
+    try:
+        db.delete(record)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+
+def delete_expired_idempotency_keys(db: Session, now: datetime):
+    try:
+        db.query(models.IdempotencyKey).filter(models.IdempotencyKey.expires_at < now).delete()
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
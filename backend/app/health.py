@@ -0,0 +1,55 @@
+# backend/app/health.py
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.database import engine
+
+# === CONFIG ===
+# How long a readiness result is reused before the database is pinged again
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "5"))
+
+# A ping still running after this long reports the database as unavailable
+READINESS_PING_TIMEOUT_SECONDS = float(os.getenv("READINESS_PING_TIMEOUT_SECONDS", "2"))
+
+_lock = threading.Lock()
+_last_check = {"checked_at": 0.0, "ok": False, "error": "not checked yet", "refresh_started": None}
+
+
+def _ping():
+    try:
+        # A pooled connection, not a Session: nothing to set up or tear down
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True, None
+    except Exception as e:
+        return False, str(e)
+
+
+def database_status(max_age: float = READINESS_CACHE_SECONDS) -> dict:
+    """Cached result of a DB ping; at most one ping per max_age however often probes hit.
+
+    One probe refreshes while the others return the last result straight
+    away, so a hung database never queues probes behind the lock. A refresh
+    outstanding for READINESS_PING_TIMEOUT_SECONDS counts as a failure.
+    """
+    with _lock:
+        refresh = (time.monotonic() - _last_check["checked_at"] > max_age
+                   and _last_check["refresh_started"] is None)
+        if refresh:
+            _last_check["refresh_started"] = time.monotonic()
+
+    if refresh:
+        ok, error = _ping()
+        with _lock:
+            _last_check.update(checked_at=time.monotonic(), ok=ok, error=error, refresh_started=None)
+
+    with _lock:
+        now = time.monotonic()
+        ok, error = _last_check["ok"], _last_check["error"]
+        started = _last_check["refresh_started"]
+        if started is not None and now - started > READINESS_PING_TIMEOUT_SECONDS:
+            ok, error = False, f"database ping unanswered for {now - started:.1f}s"
+        return {"ok": ok, "error": error, "checked_seconds_ago": round(now - _last_check["checked_at"], 2)}
@@ -1,10 +1,12 @@
 # backend/app/main.py
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from app.database import engine, Base, SessionLocal
-from app.routes import auth_routes, project_routes, document_routes
-from sqlalchemy import text
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse
+from app.database import engine
+from app.routes import auth_routes, project_routes, document_routes, usage_routes
+from app.services import cache_service, llm_scheduler, model_router, outline_cache
+from app import metrics, profiling, responses, schema, health
+from typing import Optional
 import logging
 import os
 
@@ -16,7 +18,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="AI Document Platform API",
     description="Backend API for AI-powered document generation",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=responses.FastJSONResponse
 )
 
 # FINAL WORKING CORS — THIS FIXES REGISTER/LOGIN ON VERCEL
@@ -28,16 +31,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# brotli/gzip for JSON bodies over COMPRESSION_MIN_BYTES
+app.add_middleware(responses.CompressionMiddleware)
+
+# Request latency / in-flight metrics, exposed at /metrics
+app.add_middleware(metrics.MetricsMiddleware, fastapi_app=app)
+metrics.instrument_engine(engine)
+
+# Opt-in per-request cProfile capture (admin token required)
+if profiling.PROFILING_ADMIN_TOKEN:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
 # Database startup
 @app.on_event("startup")
 async def startup_event():
     try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables ready")
-
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()
+        # One query when the stored schema version matches this build
+        schema.ensure_schema(engine)
         logger.info("Database connection successful")
     except Exception as e:
         logger.error(f"Database startup failed: {e}")
@@ -50,6 +60,7 @@ async def startup_event():
 app.include_router(auth_routes.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(project_routes.router, prefix="/api/projects", tags=["Projects"])
 app.include_router(document_routes.router, prefix="/api/documents", tags=["Documents"])
+app.include_router(usage_routes.router, prefix="/api/usage", tags=["Usage"])
 
 # Root & health
 @app.get("/")
@@ -58,13 +69,27 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    try:
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()
+    database = health.database_status()
+    if database["ok"]:
         return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
+    return {"status": "unhealthy", "error": database["error"]}
+
+# Liveness: the process is serving requests; never touches the database
+@app.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+# Readiness: can take traffic; DB ping cached for READINESS_CACHE_SECONDS
+@app.get("/health/ready")
+def readiness():
+    database = health.database_status()
+    if not database["ok"]:
+        return JSONResponse(status_code=503, content={"status": "not ready", "database": database})
+    return {"status": "ready", "database": database}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 # Debug route (optional - you can keep it)
 @app.get("/debug/routes")
@@ -74,6 +99,43 @@ def debug_routes():
     ]
     return {"total_routes": len(routes), "routes": routes}
 
+@app.get("/debug/cache")
+def debug_cache():
+    return {"project_cache": cache_service.get_stats()}
+
+@app.get("/debug/llm-scheduler")
+def debug_llm_scheduler():
+    return llm_scheduler.get_stats()
+
+@app.get("/debug/llm-routing")
+def debug_llm_routing():
+    return model_router.get_stats()
+
+@app.get("/debug/outline-cache")
+def debug_outline_cache():
+    return outline_cache.get_stats()
+
+# Stored request profiles (admin only)
+def _require_profiling_admin(x_profile_token: Optional[str]):
+    if not profiling.is_admin_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling admin token required")
+
+@app.get("/debug/profiles", include_in_schema=False)
+def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    _require_profiling_admin(x_profile_token)
+    return {"profiles": profiling.list_profiles()}
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+def download_profile(profile_id: str, format: str = "prof", x_profile_token: Optional[str] = Header(None)):
+    """Raw pstats file (open with snakeviz/pstats), or ?format=text for a summary"""
+    _require_profiling_admin(x_profile_token)
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        return PlainTextResponse(profiling.render_profile_text(profile_id))
+    return FileResponse(profile["file"], media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -0,0 +1,236 @@
+# backend/app/metrics.py
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+# Seconds; covers fast SQL through slow Gemini calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span totals for the current request, reported back as a Server-Timing header
+_request_spans: ContextVar[Optional[dict]] = ContextVar("request_spans", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le=bound)} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le='+Inf')} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series['count']}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Counter(Gauge):
+    """Monotonic total; only goes up"""
+
+    def inc(self, *labels, amount: float = 1):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        super().inc(*labels, amount=amount)
+
+    def dec(self, *labels, amount: float = 1):
+        raise TypeError("Counters can only increase")
+
+    def set(self, value: float, *labels):
+        raise TypeError("Counters can only increase")
+
+    def render(self) -> list:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} counter"
+        return lines
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+HTTP_REQUEST_DURATION = register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+))
+HTTP_REQUESTS_IN_FLIGHT = register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method", "route")
+))
+SPAN_DURATION = register(Histogram(
+    "app_span_duration_seconds", "Time spent in named spans (LLM calls, rendering)", ("span",)
+))
+DB_QUERY_DURATION = register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement type", ("statement",)
+))
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# === SPANS ===
+def _record_span(name: str, elapsed: float):
+    SPAN_DURATION.observe(elapsed, name)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def span(name: str):
+    """Time a block under app_span_duration_seconds{span=name}"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_span(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# === SQL ===
+def instrument_engine(engine):
+    """Time every statement via SQLAlchemy cursor events.
+
+    The start time lives on the statement's execution context, so a statement
+    that raises (no after_cursor_execute) leaves nothing behind on the pooled
+    connection.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        statement_type = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_QUERY_DURATION.observe(elapsed, statement_type)
+        _record_span("db", elapsed)
+
+
+# === HTTP ===
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histogram, in-flight gauge and a
+    Server-Timing header with the request's span breakdown"""
+
+    def __init__(self, app, fastapi_app):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    def _route_for(self, scope) -> str:
+        for route in self.fastapi_app.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_for(scope)
+        spans = {}
+        token = _request_spans.set(spans)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total = (time.perf_counter() - started) * 1000
+                timing = [f"total;dur={total:.1f}"]
+                timing.extend(f"{name.replace('.', '-')};dur={seconds * 1000:.1f}" for name, seconds in spans.items())
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", ", ".join(timing).encode())]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method, route)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method, route)
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method, route, str(status_code))
+            _request_spans.reset(token)
@@ -1,10 +1,15 @@
 # backend/app/models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
 
 
+def section_order(section):
+    """Sort key putting a project's sections in document order"""
+    return (section.position is None, section.position or 0, section.id)
+
+
 class User(Base):
     __tablename__ = "users"
    
@@ -30,7 +35,10 @@ class Project(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
    
     owner = relationship("User", back_populates="projects")
-    sections = relationship("Section", back_populates="project", cascade="all, delete-orphan")
+    sections = relationship(
+        "Section", back_populates="project", cascade="all, delete-orphan",
+        order_by="(Section.position, Section.id)"
+    )
 
 
 class Section(Base):
@@ -43,6 +51,18 @@ class Section(Base):
     
     # section_order is required by the DB
     # section_order = Column(Integer, nullable=False, default=0)
+    # Place in the outline; NULL on rows from before it existed, which keep id order
+    position = Column(Integer, nullable=True)
+    
+    # Generation checkpoint: pending / running / done / failed. Rows from
+    # before tracking existed get 'pending' (done if they have content).
+    generation_status = Column(String(16), nullable=True, default="pending", server_default="pending")
+    generation_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    generation_error = Column(Text, nullable=True)
+    generation_started_at = Column(DateTime, nullable=True)
+    # Created by speculative pre-generation and not yet generated, refined or
+    # rated by the user; rebuilt when the project outline changes
+    pregenerated = Column(Boolean, nullable=False, default=False, server_default="0")
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -75,3 +95,45 @@ class Feedback(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
    
     section = relationship("Section", back_populates="feedbacks")
+
+
+
+class LLMUsage(Base):
+    __tablename__ = "llm_usage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True, index=True)
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="SET NULL"), nullable=True)
+    operation = Column(String, nullable=False)  # 'generate_section_content', 'refine_content', ...
+    model = Column(String, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    tokens_estimated = Column(Boolean, nullable=False, default=False)  # SDK returned no usage metadata
+    latency_ms = Column(Integer, nullable=False, default=0)
+    cache_status = Column(String, nullable=False, default="miss")  # 'miss' = real model call, 'hit' = served from cache
+    success = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class LLMQuota(Base):
+    __tablename__ = "llm_quotas"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    daily_token_limit = Column(Integer, nullable=True)  # NULL = use LLM_DAILY_TOKEN_QUOTA
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String, nullable=False)
+    endpoint = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)  # sha256 of endpoint + canonical request body
+    status = Column(String, nullable=False, default="in_progress")  # 'in_progress' or 'completed'
+    response_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,198 @@
+# backend/app/profiling.py
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+# === CONFIG ===
+# Profiling is off unless this is set; requests opt in by sending it as the
+# X-Profile-Token header or ?profile_token= query parameter.
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+# Fraction of opted-in requests that are actually profiled
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "1.0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "ai-document-profiles"))
+PROFILING_MAX_STORED = int(os.getenv("PROFILING_MAX_STORED", "50"))
+
+# The profiler for the current request, when it was selected for profiling
+_active_profiler: ContextVar[Optional[cProfile.Profile]] = ContextVar("active_profiler", default=None)
+
+# cProfile allows one enabled profiler per process (3.12+) and async requests
+# share the loop thread, so only one request is profiled at a time
+_profiling_slot = threading.Lock()
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(PROFILING_ADMIN_TOKEN and token and hmac.compare_digest(token, PROFILING_ADMIN_TOKEN))
+
+
+# === ROUTE HOOK ===
+def _profiled(endpoint):
+    """Run the endpoint under the request's profiler, if there is one.
+
+    Sync endpoints execute in a threadpool worker, which cProfile can only
+    see from inside that thread, so the hook has to live around the endpoint
+    rather than in the middleware. Async endpoints are profiled on the event
+    loop thread and may include frames from other requests interleaving.
+    """
+    if getattr(endpoint, "__profiled__", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profiler = _active_profiler.get()
+            if profiler is None:
+                return await endpoint(*args, **kwargs)
+            profiler.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profiler = _active_profiler.get()
+            if profiler is None:
+                return endpoint(*args, **kwargs)
+            profiler.enable()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled per request"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+# === STORAGE ===
+def _store_profile(profile_id: str, profiler: cProfile.Profile, method: str, path: str, status_code: int, elapsed: float):
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    file_path = os.path.join(PROFILING_DIR, f"{profile_id}.prof")
+    profiler.dump_stats(file_path)
+
+    with _profiles_lock:
+        _profiles[profile_id] = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 1),
+            "created_at": time.time(),
+            "file": file_path,
+        }
+        while len(_profiles) > PROFILING_MAX_STORED:
+            _, evicted = _profiles.popitem(last=False)
+            try:
+                os.remove(evicted["file"])
+            except OSError:
+                pass
+
+
+def list_profiles() -> list:
+    with _profiles_lock:
+        return [
+            {key: value for key, value in profile.items() if key != "file"}
+            for profile in reversed(_profiles.values())
+        ]
+
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+def render_profile_text(profile_id: str, limit: int = 50) -> Optional[str]:
+    profile = get_profile(profile_id)
+    if profile is None:
+        return None
+    stream = io.StringIO()
+    stats = pstats.Stats(profile["file"], stream=stream)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+# === MIDDLEWARE ===
+class ProfilingMiddleware:
+    """Select opted-in requests for profiling and store the result.
+
+    The profile id is returned in the X-Profile-Id response header. While
+    another request is being profiled, opted-in requests run unprofiled and
+    get X-Profile-Skipped: busy instead.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == b"x-profile-token":
+                return is_admin_token(value.decode("latin-1"))
+        if b"profile_token" in scope.get("query_string", b""):
+            tokens = parse_qs(scope["query_string"].decode("latin-1")).get("profile_token", [])
+            return bool(tokens) and is_admin_token(tokens[0])
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope) or random.random() >= PROFILING_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        if not _profiling_slot.acquire(blocking=False):
+            async def send_skipped(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-skipped", b"busy")]
+                await send(message)
+
+            await self.app(scope, receive, send_skipped)
+            return
+
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _profiling_slot.release()
+
+    async def _profile(self, scope, receive, send):
+        profiler = cProfile.Profile()
+        token = _active_profiler.set(profiler)
+        profile_id = uuid.uuid4().hex
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _active_profiler.reset(token)
+            _store_profile(
+                profile_id, profiler, scope["method"], scope["path"], status_code, time.perf_counter() - started
+            )
@@ -0,0 +1,143 @@
+# backend/app/responses.py
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+
+try:
+    import orjson
+except ImportError:  # falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# === CONFIG ===
+# Responses smaller than this aren't worth compressing
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+class FastJSONResponse(JSONResponse):
+    """Compact JSON via orjson when installed"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# === CONDITIONAL GET ===
+def weak_etag(*parts) -> str:
+    """Weak validator from anything that changes whenever the representation does"""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in candidates)
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response if the client already has `etag`, else None"""
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return None
+
+
+def json_with_etag(content: Any, etag: str) -> FastJSONResponse:
+    # no-cache = browsers keep the body but revalidate with If-None-Match every time
+    return FastJSONResponse(content=content, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+# === COMPRESSION ===
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    offered = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    for encoding in (("br",) if brotli is not None else ()) + ("gzip",):
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Negotiated brotli/gzip for single-shot JSON and text responses.
+
+    Streaming responses (exports) and anything already encoded pass through
+    untouched; so do bodies under COMPRESSION_MIN_BYTES.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = _choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            pending, start = start, None
+            headers = MutableHeaders(raw=list(pending["headers"]))
+            body = message.get("body", b"")
+            compressible = (
+                not message.get("more_body", False)
+                and len(body) >= self.minimum_size
+                and "content-encoding" not in headers
+                and headers.get("content-type", "").startswith(_COMPRESSIBLE_TYPES)
+            )
+            if compressible:
+                body = _compress(body, encoding)
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(body))
+                message = {**message, "body": body}
+            headers.add_vary_header("Accept-Encoding")
+            await send({**pending, "headers": headers.raw})
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,19 +1,21 @@
 # backend/app/routes/auth_routes.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 from app import schemas, crud, models
 from app.database import get_db
+from app.profiling import ProfiledRoute
 from app.auth import (
-    verify_password,
+    verify_password_async,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     get_current_user,
-    get_password_hash
+    get_password_hash_async
 )
 import logging
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 logger = logging.getLogger(__name__)
 
 
@@ -24,36 +26,33 @@ logger = logging.getLogger(__name__)
 async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     logger.info(f"Registration attempt → username: {user.username}, email: {user.email}")
 
-    # Check username
-    if crud.get_user_by_username(db, user.username):
+    # One query for both uniqueness checks; DB calls run in the threadpool so
+    # they don't block the event loop
+    existing_users = await run_in_threadpool(crud.get_users_by_username_or_email, db, user.username, user.email)
+    if any(existing.username == user.username for existing in existing_users):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
-
-    # Check email
-    if crud.get_user_by_email(db, user.email):
+    if existing_users:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
 
-    # Hash password + create user
-    hashed_password = get_password_hash(user.password)
-    new_user = schemas.UserCreate(
-        username=user.username,
-        email=user.email,
-        password=hashed_password
-    )
-    created_user = crud.create_user(db=db, user=new_user)
-
-    # Commit
-    db.commit()
-    db.refresh(created_user)
+    # Hash once, off the event loop
+    hashed_password = await get_password_hash_async(user.password)
+    created_user = await run_in_threadpool(crud.create_user, db=db, user=user, hashed_password=hashed_password)
+    if created_user is None:
+        # Lost a race on the unique constraints
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
 
     # Generate token
     access_token = create_access_token(
-        data={"sub": created_user.username},
+        data={"sub": created_user.username, "uid": created_user.id},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
@@ -77,8 +76,8 @@ async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 async def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     logger.info(f"Login attempt → username: {user_credentials.username}")
 
-    user = crud.get_user_by_username(db, user_credentials.username)
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    user = await run_in_threadpool(crud.get_user_by_username, db, user_credentials.username)
+    if not user or not await verify_password_async(user_credentials.password, user.hashed_password):
         logger.warning("Login failed → invalid username or password")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,7 +86,7 @@ async def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_d
         )
 
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, "uid": user.id},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
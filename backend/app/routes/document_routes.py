@@ -1,22 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header
 from sqlalchemy.orm import Session
-from app import models, schemas, crud
+from app import schemas, crud, cancellation, models
+from app.cancellation import CancellationToken, request_cancellation
 from app.database import get_db
-from app.auth import get_current_user
-from app.services import llm_service
+from app.profiling import ProfiledRoute
+from app.auth import get_current_principal, Principal
+from app.services import llm_service, usage_service, llm_scheduler, idempotency_service, prompt_builder, partial_refinement, pregeneration_service, outline_cache
+from app.services import generation_state
 from fastapi.responses import StreamingResponse
 from app.services import document_service
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Sections refined in parallel by one bulk-refine request
+BULK_REFINE_CONCURRENCY = int(os.getenv("BULK_REFINE_CONCURRENCY", "4"))
+
+
+@contextmanager
+def _llm_work(db: Session, user_id: int, project_id: int, section_id: int, lane: str, cancel: CancellationToken):
+    """Scope for llm_service calls: cancellation, fair scheduling and usage tracking"""
+    with cancellation.scope(cancel), \
+            llm_scheduler.caller(user_id, lane), \
+            usage_service.track_usage(db, user_id, project_id, section_id):
+        yield
+
+
+def _cancelled_exception(e: cancellation.Cancelled) -> HTTPException:
+    # 499 = client closed request (nobody reads it); 504 = our own deadline
+    status_code = 499 if e.reason == "client disconnected" else 504
+    return HTTPException(status_code=status_code, detail=f"Generation cancelled: {e.reason}")
 
 @router.post("/generate-section-content")
 def generate_section_content(
     request: schemas.ContentGenerate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal),
+    cancel: CancellationToken = Depends(request_cancellation),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """Generate AI content for a specific section"""
-    
+    return idempotency_service.run_once(
+        db, current_user.id, idempotency_key, "generate-section-content", request.model_dump(),
+        lambda: _generate_section_content(request, db, current_user, cancel)
+    )
+
+def _generate_section_content(request: schemas.ContentGenerate, db: Session, current_user: Principal, cancel: CancellationToken):
     # Get the section
     section = crud.get_section(db, section_id=request.section_id)
     if not section:
@@ -27,20 +60,62 @@ def generate_section_content(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    try:
+        usage_service.check_quota(db, current_user.id)
+    except usage_service.QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    # An explicit request always runs, even over a generation still in flight
+    if not crud.claim_section_generation(db, section.id, generation_state.stale_before(), force=True):
+        raise HTTPException(status_code=409, detail="Section was deleted or could not be locked for generation; try again")
+    
     try:
         # Generate content using LLM
-        content = llm_service.generate_section_content(
-            topic=project.topic,
-            section_title=section.title,
-            document_type=project.document_type,
-            context=""
-        )
+        with _llm_work(db, current_user.id, project.id, section.id, llm_scheduler.INTERACTIVE, cancel):
+            content = llm_service.generate_section_content(
+                topic=project.topic,
+                section_title=section.title,
+                document_type=project.document_type,
+                context=prompt_builder.build_section_context(project, section)
+            )
         
         # Update section with generated content
         section = crud.update_section_content(db, section_id=section.id, content=content)
         
         return {"success": True, "content": content, "section_id": section.id}
     
+    except cancellation.Cancelled as e:
+        crud.finish_section_generation(db, section.id, generation_state.status_after_cancel(section), f"cancelled: {e.reason}")
+        raise _cancelled_exception(e)
+    except Exception as e:
+        crud.finish_section_generation(db, section.id, generation_state.FAILED, str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate-outline", response_model=schemas.OutlineResponse)
+def generate_outline(
+    request: schemas.OutlineGenerate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+    cancel: CancellationToken = Depends(request_cancellation)
+):
+    """Suggest section/slide titles for a topic, reusing cached outlines for near-duplicate topics"""
+    
+    try:
+        with _llm_work(db, current_user.id, None, None, llm_scheduler.INTERACTIVE, cancel):
+            # Quota only matters when the model is actually called
+            return outline_cache.get_outline(
+                topic=request.topic,
+                document_type=request.document_type,
+                num_sections=request.num_sections,
+                fresh=request.fresh,
+                allow_similar=request.allow_similar,
+                on_miss=lambda: usage_service.check_quota(db, current_user.id)
+            )
+    
+    except usage_service.QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except cancellation.Cancelled as e:
+        raise _cancelled_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -48,10 +123,17 @@ def generate_section_content(
 def refine_section_content(
     request: schemas.ContentRefine,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal),
+    cancel: CancellationToken = Depends(request_cancellation),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """Refine content of a section based on user prompt"""
-    
+    return idempotency_service.run_once(
+        db, current_user.id, idempotency_key, "refine-section-content", request.model_dump(),
+        lambda: _refine_section_content(request, db, current_user, cancel)
+    )
+
+def _refine_section_content(request: schemas.ContentRefine, db: Session, current_user: Principal, cancel: CancellationToken):
     # Get the section
     section = crud.get_section(db, section_id=request.section_id)
     if not section:
@@ -65,39 +147,164 @@ def refine_section_content(
     if not section.content:
         raise HTTPException(status_code=400, detail="Section has no content to refine")
     
+    try:
+        targets = partial_refinement.resolve_targets(
+            section.content, project.document_type, request.prompt, request.paragraphs
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        usage_service.check_quota(db, current_user.id)
+    except usage_service.QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
     try:
         # Store old content
         old_content = section.content
         
-        # Refine content using LLM
-        new_content = llm_service.refine_content(
-            original_content=old_content,
-            refinement_prompt=request.prompt,
-            document_type=project.document_type
-        )
+        with _llm_work(db, current_user.id, project.id, section.id, llm_scheduler.INTERACTIVE, cancel):
+            if targets:
+                # Only the targeted paragraphs/bullets go to the model
+                before, after = partial_refinement.neighbours(old_content, project.document_type, targets)
+                try:
+                    fragments = llm_service.refine_fragments(
+                        partial_refinement.target_blocks(old_content, project.document_type, targets),
+                        refinement_prompt=request.prompt,
+                        document_type=project.document_type,
+                        before=before,
+                        after=after
+                    )
+                except llm_service.FragmentParseError:
+                    # Model ignored the markers; the prompt still names the
+                    # paragraphs, so a whole-section refinement honours it
+                    targets = []
+            if targets:
+                new_content, old_span, new_span = partial_refinement.splice(
+                    old_content, project.document_type, targets, fragments
+                )
+            else:
+                # Refine content using LLM
+                new_content = llm_service.refine_content(
+                    original_content=old_content,
+                    refinement_prompt=request.prompt,
+                    document_type=project.document_type
+                )
+                old_span, new_span = old_content, new_content
         
-        # Save refinement history
+        # Save refinement history (only the changed span for partial refinements)
         crud.create_refinement(
             db,
             section_id=section.id,
             prompt=request.prompt,
-            old_content=old_content,
-            new_content=new_content
+            old_content=old_span,
+            new_content=new_span
         )
         
         # Update section with refined content
         section = crud.update_section_content(db, section_id=section.id, content=new_content)
         
-        return {"success": True, "content": new_content, "section_id": section.id}
+        return {"success": True, "content": new_content, "section_id": section.id, "refined_paragraphs": targets or None}
     
+    except cancellation.Cancelled as e:
+        raise _cancelled_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/bulk-refine/{project_id}")
+def bulk_refine_content(
+    project_id: int,
+    request: schemas.BulkRefine,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+    cancel: CancellationToken = Depends(request_cancellation),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Apply one refinement prompt to many sections concurrently"""
+    return idempotency_service.run_once(
+        db, current_user.id, idempotency_key, "bulk-refine", {"project_id": project_id, **request.model_dump()},
+        lambda: _bulk_refine_content(project_id, request, db, current_user, cancel),
+        cacheable=lambda result: result["cancelled"] is None
+    )
+
+def _bulk_refine_content(project_id: int, request: schemas.BulkRefine, db: Session, current_user: Principal, cancel: CancellationToken):
+    # Get project
+    project = crud.get_project(db, project_id=project_id, user_id=current_user.id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    sections = sorted(project.sections, key=models.section_order)
+    if request.section_ids is not None:
+        unknown = set(request.section_ids) - {s.id for s in sections}
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Sections not found in project: {sorted(unknown)}")
+        sections = [s for s in sections if s.id in set(request.section_ids)]
+    sections = [s for s in sections if s.content]
+    if not sections:
+        raise HTTPException(status_code=400, detail="No sections with content to refine")
+    
+    try:
+        usage_service.check_quota(db, current_user.id)
+    except usage_service.QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    # Plain values only: ORM objects must not cross into the worker threads
+    jobs = [(s.id, s.title, s.content) for s in sections]
+    document_type = project.document_type
+    
+    def refine(old_content):
+        with usage_service.collect_usage() as usage:
+            try:
+                return llm_service.refine_content(
+                    original_content=old_content,
+                    refinement_prompt=request.prompt,
+                    document_type=document_type
+                ), None, usage
+            except cancellation.Cancelled as e:
+                return None, e.reason, usage
+            except Exception as e:
+                return None, str(e), usage
+    
+    # Workers inherit this request's cancellation token and scheduler lane
+    executor = ThreadPoolExecutor(max_workers=min(BULK_REFINE_CONCURRENCY, len(jobs)), thread_name_prefix="bulk-refine")
+    with cancellation.scope(cancel), llm_scheduler.caller(current_user.id, llm_scheduler.BULK):
+        futures = [executor.submit(contextvars.copy_context().run, refine, content) for _, _, content in jobs]
+    
+    outcomes = []
+    try:
+        for future in futures:
+            outcomes.append(cancel.wait_for(future))
+    except cancellation.Cancelled as e:
+        # Keep whatever finished; the rest is reported as skipped
+        outcomes += [f.result() if f.done() else (None, e.reason, []) for f in futures[len(outcomes):]]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    results = [
+        {"section_id": section_id, "old_content": old_content, "new_content": new_content, "usage": usage}
+        for (section_id, _, old_content), (new_content, _, usage) in zip(jobs, outcomes)
+    ]
+    applied = crud.apply_bulk_refinement(db, current_user.id, project.id, request.prompt, results)
+    if applied is None:
+        raise HTTPException(status_code=500, detail="Failed to save refinements")
+    
+    response = []
+    for (section_id, title, _), (new_content, error, _) in zip(jobs, outcomes):
+        if section_id in applied:
+            response.append({"section_id": section_id, "title": title, "success": True, "content": new_content})
+        else:
+            response.append({
+                "section_id": section_id, "title": title, "success": False,
+                "error": error or "Section was edited during the refinement"
+            })
+    
+    return {"success": True, "results": response, "cancelled": cancel.reason}
+
 @router.post("/feedback")
 def add_feedback(
     request: schemas.FeedbackCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Add feedback (like/dislike/comment) to a section"""
     
@@ -120,17 +327,44 @@ def add_feedback(
 def generate_all_content(
     project_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal),
+    cancel: CancellationToken = Depends(request_cancellation),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Generate content for all sections in a project"""
-    
+    """Generate content for all sections in a project that don't have any yet"""
+    return idempotency_service.run_once(
+        db, current_user.id, idempotency_key, "generate-all-content", {"project_id": project_id},
+        lambda: _generate_all_content(project_id, db, current_user, cancel),
+        cacheable=lambda result: result["cancelled"] is None and result["quota_exceeded"] is None
+    )
+
+@router.post("/retry-failed-content/{project_id}")
+def retry_failed_content(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+    cancel: CancellationToken = Depends(request_cancellation),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Regenerate only the sections whose last generation failed or was abandoned"""
+    return idempotency_service.run_once(
+        db, current_user.id, idempotency_key, "retry-failed-content", {"project_id": project_id},
+        lambda: _generate_all_content(project_id, db, current_user, cancel, failed_only=True),
+        cacheable=lambda result: result["cancelled"] is None and result["quota_exceeded"] is None
+    )
+
+def _generate_all_content(project_id: int, db: Session, current_user: Principal, cancel: CancellationToken,
+                          failed_only: bool = False):
     # Get project
     project = crud.get_project(db, project_id=project_id, user_id=current_user.id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    # The user is waiting now; finish the job in the bulk lane instead
+    pregeneration_service.cancel(project.id, "superseded by generate-all")
+    
     # Create sections if they don't exist
-    if project.structure and 'sections' in project.structure:
+    if project.structure and 'sections' in project.structure and not failed_only:
         existing_sections = len(project.sections)
         sections_to_create = project.structure['sections']
         
@@ -138,34 +372,83 @@ def generate_all_content(
         if existing_sections == 0:
             for idx, section_title in enumerate(sections_to_create):
                 # Pass section_order (idx) to match DB schema
-                crud.create_section(db, project_id=project.id, title=section_title)
+                crud.create_section(db, project_id=project.id, title=section_title, position=idx)
             
             # Refresh project
             db.refresh(project)
     
-    # Generate content for each section
+    # Generate content for each unfinished section. Progress is saved per
+    # section, so a retry after a crash, timeout or cancel resumes here.
     results = []
-    for section in project.sections:
-        if not section.content:  # Only generate if no content exists
-            try:
+    quota_exceeded = None
+    generated = 0
+    sections = sorted(project.sections, key=models.section_order)
+    outline = prompt_builder.snapshot(sections)  # kept current as sections are written
+    for index, section in enumerate(sections):
+        status = generation_state.status_of(section)
+        if status == generation_state.DONE:
+            continue
+        if failed_only and status == generation_state.PENDING:
+            continue
+        
+        result = {"section_id": section.id, "title": section.title, "success": False}
+        if status == generation_state.RUNNING and not generation_state.is_stale(section):
+            results.append({**result, "skipped": True, "status": status, "error": "Generation already in progress"})
+            continue
+        if status == generation_state.FAILED and section.generation_attempts >= generation_state.GENERATION_MAX_ATTEMPTS:
+            # Give up automatically; generating the section on its own still works
+            results.append({**result, "status": status, "attempts": section.generation_attempts, "error": section.generation_error})
+            continue
+        if cancel.cancelled or quota_exceeded:
+            # Client gone, out of time or out of tokens: skip the rest, keep what's done
+            results.append({**result, "skipped": True, "status": status, "error": cancel.reason or quota_exceeded})
+            continue
+        
+        try:
+            usage_service.check_quota(db, current_user.id)
+        except usage_service.QuotaExceeded as e:
+            if not generated:
+                raise HTTPException(status_code=429, detail=str(e))
+            quota_exceeded = str(e)
+            results.append({**result, "skipped": True, "status": status, "error": quota_exceeded})
+            continue
+        if not crud.claim_section_generation(db, section.id, generation_state.stale_before()):
+            results.append({**result, "skipped": True, "status": generation_state.RUNNING, "error": "Generation already in progress"})
+            continue
+        
+        try:
+            with _llm_work(db, current_user.id, project.id, section.id, llm_scheduler.BULK, cancel):
                 content = llm_service.generate_section_content(
                     topic=project.topic,
                     section_title=section.title,
                     document_type=project.document_type,
-                    context=""
+                    context=prompt_builder.build_section_context(project, section, sections=outline)
                 )
-                crud.update_section_content(db, section_id=section.id, content=content)
-                results.append({"section_id": section.id, "title": section.title, "success": True})
-            except Exception as e:
-                results.append({"section_id": section.id, "title": section.title, "success": False, "error": str(e)})
+            saved = crud.update_section_content(db, section_id=section.id, content=content)
+            if saved is not None:
+                outline[index] = prompt_builder.SectionInfo(saved.id, saved.title, saved.content, saved.updated_at)
+            generated += 1
+            results.append({**result, "success": True, "status": generation_state.DONE, "attempts": section.generation_attempts})
+        except cancellation.Cancelled as e:
+            crud.finish_section_generation(db, section.id, generation_state.status_after_cancel(section), f"cancelled: {e.reason}")
+            results.append({**result, "skipped": True, "status": section.generation_status, "error": e.reason})
+        except Exception as e:
+            crud.finish_section_generation(db, section.id, generation_state.FAILED, str(e))
+            results.append({**result, "status": generation_state.FAILED, "attempts": section.generation_attempts, "error": str(e)})
     
-    return {"success": True, "results": results}
+    return {
+        "success": True,
+        "results": results,
+        "sections": generation_state.summarise(project.sections),
+        "cancelled": cancel.reason,
+        "quota_exceeded": quota_exceeded,
+    }
 
 @router.get("/export/{project_id}")
 def export_document(
     project_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Export project as .docx or .pptx file"""
     
@@ -1,34 +1,144 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Header
 from sqlalchemy.orm import Session
-from typing import List
-from app import schemas, crud, models
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from app import schemas, crud, responses
 from app.database import get_db
-from app.auth import get_current_user
+from app.profiling import ProfiledRoute
+from app.auth import get_current_principal, Principal
+from app.services import search_service, cache_service, pregeneration_service, import_service
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.post("/", response_model=schemas.ProjectResponse)
 def create_project(
     project: schemas.ProjectCreate,
+    pregenerate: bool = Query(False, description="Create sections from the outline and start generating them in the background"),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    return crud.create_project(db=db, project=project, user_id=current_user.id)
+    db_project = crud.create_project(db=db, project=project, user_id=current_user.id)
+    titles = (project.structure or {}).get("sections") or []
+    if db_project and pregenerate and titles and pregeneration_service.PREGENERATION_ENABLED:
+        crud.create_sections(db, project_id=db_project.id, titles=titles, pregenerated=True)
+        pregeneration_service.schedule(db_project.id, current_user.id)
+    return db_project
+
+@router.post("/import", response_model=schemas.ProjectResponse)
+async def import_project(
+    request: Request,
+    filename: Optional[str] = Query(None, description="Original file name, used as the default title"),
+    title: Optional[str] = Query(None),
+    content_length: Optional[int] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Create a project from a .docx, .pptx or .pdf sent as the raw request body.
+
+    The body is streamed to a spooled temp file (never fully buffered) and
+    the type is detected from its content; parsing runs in the threadpool.
+    """
+    try:
+        if content_length is not None and content_length > import_service.IMPORT_MAX_BYTES:
+            raise import_service.ImportRejected(413, f"File is larger than the {import_service.IMPORT_MAX_BYTES // (1024 * 1024)} MB import limit")
+        spool = await import_service.spool_upload(request.stream())
+        try:
+            return await run_in_threadpool(
+                import_service.import_document, db, current_user.id, spool, filename=filename, title=title
+            )
+        finally:
+            spool.close()
+    except import_service.ImportRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 @router.get("/", response_model=List[schemas.ProjectResponse])
 def get_projects(
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    return crud.get_user_projects(db=db, user_id=current_user.id)
+    # One aggregate query decides whether the client's copy is still current
+    etag = responses.weak_etag("projects", current_user.id, *crud.get_user_projects_fingerprint(db, current_user.id))
+    unchanged = responses.not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    projects = crud.get_user_projects(db=db, user_id=current_user.id)
+    payload = [schemas.ProjectResponse.model_validate(project).model_dump(mode="json") for project in projects]
+    return responses.json_with_etag(payload, etag)
+
+@router.get("/search", response_model=schemas.ProjectSearchPage)
+def search_projects(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Full-text search over the user's project titles/topics and section content"""
+    total, hits = search_service.search_projects(
+        db, user_id=current_user.id, query=q, limit=limit, offset=offset
+    )
+    results = [
+        {**schemas.ProjectResponse.model_validate(project).model_dump(), "rank": rank}
+        for project, rank in hits
+    ]
+    return {"total": total, "limit": limit, "offset": offset, "results": results}
+
+def _project_etag(payload: dict) -> str:
+    # Section writes bump the section's updated_at, not the project's
+    return responses.weak_etag(
+        "project", payload["id"], payload["updated_at"],
+        [(section["id"], section["updated_at"]) for section in payload["sections"]]
+    )
 
 @router.get("/{project_id}", response_model=schemas.ProjectWithSections)
 def get_project(
     project_id: int,
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
+):
+    # Editor polls this endpoint, so serve the serialised aggregate from cache
+    payload = cache_service.get_project(project_id)
+    if payload is not None:
+        if payload["user_id"] != current_user.id:
+            raise HTTPException(status_code=404, detail="Project not found")
+    else:
+        version = cache_service.get_project_version(project_id)
+        project = crud.get_project(db=db, project_id=project_id, user_id=current_user.id)
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        payload = schemas.ProjectWithSections.model_validate(project).model_dump(mode="json")
+        cache_service.set_project(project_id, version, payload)
+
+    etag = _project_etag(payload)
+    return responses.not_modified(request, etag) or responses.json_with_etag(payload, etag)
+
+@router.put("/{project_id}", response_model=schemas.ProjectResponse)
+def update_project(
+    project_id: int,
+    project_update: schemas.ProjectUpdate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     project = crud.get_project(db=db, project_id=project_id, user_id=current_user.id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
+
+    update_data = project_update.model_dump(exclude_unset=True)
+    outline_changed = any(field in update_data and update_data[field] != getattr(project, field)
+                          for field in ("structure", "topic", "document_type"))
+    if outline_changed:
+        # Speculative content was written for the old outline
+        pregeneration_service.cancel(project_id, "outline edited")
+
+    project = crud.update_project(db=db, project_id=project_id, user_id=current_user.id, project_update=project_update)
+    if not project:
+        raise HTTPException(status_code=500, detail="Failed to update project")
+    if outline_changed:
+        titles = (project.structure or {}).get("sections") or []
+        if crud.rebuild_pregenerated_sections(db, project_id=project.id, titles=titles):
+            db.refresh(project)
     return project
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app import crud, models
+from app.database import get_db
+from app.profiling import ProfiledRoute
+from app.auth import get_current_principal, Principal
+from app.services import usage_service
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _summary_row(row) -> dict:
+    summary = {
+        "calls": row.calls,
+        "prompt_tokens": int(row.prompt_tokens),
+        "output_tokens": int(row.output_tokens),
+        "total_tokens": int(row.prompt_tokens) + int(row.output_tokens),
+        "avg_latency_ms": round(float(row.avg_latency_ms), 1),
+        "max_latency_ms": int(row.max_latency_ms),
+        "cache_hits": row.cache_hits,
+        "failures": row.failures,
+    }
+    if "key" in row._fields:
+        summary = {"key": row.key, **summary}
+    return summary
+
+
+@router.get("/")
+def get_usage(
+    days: int = Query(30, ge=1, le=365),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """LLM token/latency totals for the current user, broken down by operation, model and project"""
+    since = datetime.utcnow() - timedelta(days=days)
+
+    def summary(group_by=None):
+        rows = crud.get_llm_usage_summary(db, current_user.id, since, group_by=group_by)
+        return [_summary_row(row) for row in rows]
+
+    return {
+        "days": days,
+        "totals": summary()[0],
+        "by_operation": summary(models.LLMUsage.operation),
+        "by_model": summary(models.LLMUsage.model),
+        "by_project": summary(models.LLMUsage.project_id),
+        "quota": usage_service.get_quota_status(db, current_user.id),
+    }
+
+
+@router.get("/projects/{project_id}")
+def get_project_usage(
+    project_id: int,
+    days: int = Query(30, ge=1, le=365),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """LLM token/latency totals for one project, broken down by section and operation"""
+    project = crud.get_project(db, project_id=project_id, user_id=current_user.id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    since = datetime.utcnow() - timedelta(days=days)
+
+    def summary(group_by=None):
+        rows = crud.get_llm_usage_summary(db, current_user.id, since, group_by=group_by, project_id=project_id)
+        return [_summary_row(row) for row in rows]
+
+    return {
+        "project_id": project_id,
+        "days": days,
+        "totals": summary()[0],
+        "by_section": summary(models.LLMUsage.section_id),
+        "by_operation": summary(models.LLMUsage.operation),
+    }
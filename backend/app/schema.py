@@ -0,0 +1,154 @@
+# backend/app/schema.py
+import hashlib
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import Column, MetaData, String, Table, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import models  # noqa: F401 - registers every table on Base.metadata
+from app.database import Base
+from app.services import search_service
+
+logger = logging.getLogger(__name__)
+
+# Bump when search_service.ensure_search_index changes what it creates
+SEARCH_INDEX_REVISION = 1
+
+# pg_advisory_lock key serialising schema setup across workers (arbitrary, app-wide)
+_SETUP_LOCK_KEY = 0x5C4E3A01
+
+# Kept out of Base.metadata so it isn't part of the fingerprint it stores
+_version_table = Table(
+    "schema_version", MetaData(),
+    Column("version", String(64), primary_key=True),
+)
+
+
+def schema_fingerprint() -> str:
+    """Hash of the ORM schema (tables, columns, indexes, constraints)"""
+    parts = [f"search-index:{SEARCH_INDEX_REVISION}"]
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table:{table.name}")
+        for column in table.columns:
+            parts.append(f"column:{column.name}:{column.type!r}:{column.nullable}:{column.primary_key}")
+        # indexes/constraints are sets: sort the rendered lines, not the objects
+        parts += sorted(
+            f"index:{index.name}:{[c.name for c in index.columns]}:{index.unique}" for index in table.indexes
+        )
+        parts += sorted(
+            f"constraint:{type(constraint).__name__}:{sorted(c.name for c in constraint.columns)}"
+            for constraint in table.constraints
+        )
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _stored_version(engine):
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version FROM schema_version")).scalar()
+    except SQLAlchemyError:
+        # First boot: no version table yet
+        return None
+
+
+def _add_missing_columns(engine):
+    """ALTER TABLE ... ADD COLUMN for model columns an existing table lacks.
+
+    Only columns that are nullable or have a server_default can be added
+    this way; anything else is logged and left for a manual migration.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            if not column.nullable and column.server_default is None:
+                logger.warning(f"Column {table.name}.{column.name} is missing and needs a manual migration")
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+            if column.server_default is not None:
+                default = column.server_default.arg
+                ddl += f" DEFAULT '{default}'" if isinstance(default, str) else f" DEFAULT {default.text}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            statements.append(ddl)
+    if statements:
+        with engine.begin() as conn:
+            for ddl in statements:
+                conn.execute(text(ddl))
+                logger.info(ddl)
+
+
+@contextmanager
+def _setup_lock(engine):
+    """Hold a PostgreSQL advisory lock so only one worker sets up the schema.
+
+    Other databases (SQLite in development) run setup unlocked and rely on
+    ensure_schema retrying after a concurrent worker's changes.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _SETUP_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _SETUP_LOCK_KEY})
+
+
+def _set_up(engine, fingerprint: str):
+    # Every step skips what already exists, so a rerun finishes a partial setup
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns(engine)
+    search_service.ensure_search_index(engine)
+    with engine.begin() as conn:
+        _version_table.create(conn, checkfirst=True)
+        conn.execute(_version_table.delete())
+        conn.execute(_version_table.insert().values(version=fingerprint))
+
+
+def _up_to_date(engine, fingerprint: str) -> bool:
+    if _stored_version(engine) != fingerprint:
+        return False
+    search_service.mark_index_ready(engine)
+    logger.info("Database schema up to date")
+    return True
+
+
+def ensure_schema(engine) -> bool:
+    """Bring the schema up to date unless the stored version already matches.
+
+    A matching version costs one query; otherwise create_all (which reflects
+    every table) and the search index setup run, and the new version is
+    stored. Returns True if setup ran. Besides missing tables and indexes,
+    only new nullable/defaulted columns are added; changed columns on
+    existing tables still need a manual migration.
+
+    Workers booting together take turns (advisory lock on PostgreSQL); the
+    ones that waited find the new version stored and skip setup.
+    """
+    fingerprint = schema_fingerprint()
+    if _up_to_date(engine, fingerprint):
+        return False
+
+    with _setup_lock(engine):
+        if _up_to_date(engine, fingerprint):
+            return False
+        try:
+            _set_up(engine, fingerprint)
+        except SQLAlchemyError as e:
+            # Unlocked databases: another worker got there first ("duplicate
+            # column", "table already exists"); its work is now visible
+            if _up_to_date(engine, fingerprint):
+                return False
+            logger.warning(f"Schema setup raced with another worker, retrying: {e}")
+            _set_up(engine, fingerprint)
+    logger.info(f"Database schema set up (version {fingerprint[:12]})")
+    return True
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -69,6 +69,9 @@ class SectionResponse(SectionBase):
     id: int
     project_id: int
     content: Optional[str]
+    generation_status: Optional[str] = None
+    generation_attempts: int = 0
+    generation_error: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     
@@ -82,6 +85,25 @@ class ContentGenerate(BaseModel):
 class ContentRefine(BaseModel):
     section_id: int
     prompt: str
+    # 1-based paragraphs (docx) / bullets (pptx) to refine; omit to let the
+    # prompt decide ("shorten the second paragraph") or refine the whole section
+    paragraphs: Optional[List[int]] = None
+
+class BulkRefine(BaseModel):
+    prompt: str
+    section_ids: Optional[List[int]] = None  # defaults to every section with content
+
+class OutlineGenerate(BaseModel):
+    topic: str
+    document_type: str  # 'docx' or 'pptx'
+    num_sections: int = Field(5, ge=1, le=20)
+    fresh: bool = False  # skip the cache and always ask the model
+    allow_similar: bool = True  # accept an outline cached for a near-identical topic
+
+class OutlineResponse(BaseModel):
+    sections: List[str]
+    cached: Optional[str] = None  # 'exact', 'similar' or None for a fresh outline
+    age_seconds: int = 0
 
 class ContentResponse(BaseModel):
     content: str
@@ -118,3 +140,14 @@ class RefinementResponse(BaseModel):
 # Project with sections
 class ProjectWithSections(ProjectResponse):
     sections: List[SectionResponse] = []
+
+
+# Search
+class ProjectSearchResult(ProjectResponse):
+    rank: float
+
+class ProjectSearchPage(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    results: List[ProjectSearchResult] = []
@@ -0,0 +1,160 @@
+# backend/app/services/cache_service.py
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+PROJECT_CACHE_TTL_SECONDS = int(os.getenv("PROJECT_CACHE_TTL_SECONDS", "300"))
+PROJECT_CACHE_MAX_ENTRIES = int(os.getenv("PROJECT_CACHE_MAX_ENTRIES", "1000"))
+# Set to share the cache between workers/instances, e.g. redis://localhost:6379/0
+PROJECT_CACHE_REDIS_URL = os.getenv("PROJECT_CACHE_REDIS_URL")
+
+
+# === BACKENDS ===
+class MemoryBackend:
+    """Per-process LRU with TTL"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_version(self, key: str) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def incr_version(self, key: str) -> int:
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared backend so every worker sees the same entries and versions"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl: int):
+        self.client.set(key, json.dumps(value), ex=ttl)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def get_version(self, key: str) -> int:
+        return int(self.client.get(key) or 0)
+
+    def incr_version(self, key: str) -> int:
+        return self.client.incr(key)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+def _create_backend():
+    if PROJECT_CACHE_REDIS_URL:
+        try:
+            return RedisBackend(PROJECT_CACHE_REDIS_URL)
+        except ImportError:
+            logger.warning("PROJECT_CACHE_REDIS_URL is set but redis is not installed, using in-process cache")
+    return MemoryBackend(PROJECT_CACHE_MAX_ENTRIES)
+
+
+backend = _create_backend()
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _version_key(project_id: int) -> str:
+    return f"project-version:{project_id}"
+
+
+def _entry_key(project_id: int, version: int) -> str:
+    return f"project:{project_id}:v{version}"
+
+
+# === PROJECT AGGREGATES ===
+def get_project_version(project_id: int) -> int:
+    """Current version counter; read it *before* loading from the DB"""
+    return backend.get_version(_version_key(project_id))
+
+
+def get_project(project_id: int) -> Optional[dict]:
+    """Cached serialised ProjectWithSections, or None on a miss"""
+    version = get_project_version(project_id)
+    value = backend.get(_entry_key(project_id, version))
+    _count("hits" if value is not None else "misses")
+    return value
+
+
+def set_project(project_id: int, version: int, value: dict):
+    """Store an aggregate under the version that was current when it was loaded.
+
+    If a write invalidated the project in the meantime, the entry lands under
+    a stale version and is never read.
+    """
+    backend.set(_entry_key(project_id, version), value, PROJECT_CACHE_TTL_SECONDS)
+    _count("stores")
+
+
+def invalidate_project(project_id: int):
+    """Bump the project's version so any cached aggregate is ignored"""
+    version_key = _version_key(project_id)
+    backend.delete(_entry_key(project_id, backend.get_version(version_key)))
+    backend.incr_version(version_key)
+    _count("invalidations")
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["backend"] = type(backend).__name__
+    stats["size"] = backend.size()
+    return stats
@@ -4,7 +4,9 @@ from pptx import Presentation
 from pptx.util import Inches, Pt as PptxPt
 from io import BytesIO
 import os
+from app import metrics, models
 
+@metrics.timed("render.docx")
 def create_word_document(project, sections):
     """
     Create a Word document from project and sections
@@ -20,7 +22,7 @@ def create_word_document(project, sections):
     doc.add_paragraph()  # Empty line
     
     # Add each section
-    for section in sorted(sections, key=lambda x: x.order):
+    for section in sorted(sections, key=models.section_order):
         # Section heading
         doc.add_heading(section.title, 1)
         
@@ -40,6 +42,7 @@ def create_word_document(project, sections):
     
     return file_stream
 
+@metrics.timed("render.pptx")
 def create_powerpoint_presentation(project, sections):
     """
     Create a PowerPoint presentation from project and sections
@@ -60,7 +63,7 @@ def create_powerpoint_presentation(project, sections):
     subtitle.text = project.topic
     
     # Add content slides
-    for section in sorted(sections, key=lambda x: x.order):
+    for section in sorted(sections, key=models.section_order):
         # Use title and content layout
         bullet_slide_layout = prs.slide_layouts[1]
         slide = prs.slides.add_slide(bullet_slide_layout)
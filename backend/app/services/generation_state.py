@@ -0,0 +1,44 @@
+# backend/app/services/generation_state.py
+import os
+from datetime import datetime, timedelta
+
+# === CONFIG ===
+# A section left 'running' this long is assumed abandoned (worker died) and can be reclaimed
+GENERATION_STALE_SECONDS = int(os.getenv("GENERATION_STALE_SECONDS", "300"))
+# generate-all / retry-failed give up on a section after this many attempts
+GENERATION_MAX_ATTEMPTS = int(os.getenv("GENERATION_MAX_ATTEMPTS", "3"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def status_of(section) -> str:
+    """Effective state; pending (or NULL, from databases migrated before the
+    column had a default) rows that already have content count as done"""
+    status = section.generation_status
+    if status is None or (status == PENDING and section.content):
+        return DONE if section.content else PENDING
+    return status
+
+
+def stale_before() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=GENERATION_STALE_SECONDS)
+
+
+def is_stale(section) -> bool:
+    started = section.generation_started_at
+    return started is None or started < stale_before()
+
+
+def status_after_cancel(section) -> str:
+    # A cancelled regeneration leaves the previous content in place
+    return DONE if section.content else PENDING
+
+
+def summarise(sections) -> dict:
+    counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+    for section in sections:
+        counts[status_of(section)] += 1
+    return counts
@@ -0,0 +1,105 @@
+# backend/app/services/idempotency_service.py
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.cancellation import LLM_REQUEST_DEADLINE_SECONDS
+
+# === CONFIG ===
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+MAX_KEY_LENGTH = 255
+# An in-progress claim older than this belongs to a request that died
+STALE_CLAIM_SECONDS = LLM_REQUEST_DEADLINE_SECONDS + 30
+PURGE_INTERVAL_SECONDS = 3600
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def _request_hash(endpoint: str, payload: dict) -> str:
+    canonical = json.dumps({"endpoint": endpoint, "payload": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _purge_expired(db: Session):
+    global _last_purge
+    with _purge_lock:
+        if time.monotonic() - _last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        _last_purge = time.monotonic()
+    crud.delete_expired_idempotency_keys(db, datetime.utcnow())
+
+
+def run_once(
+    db: Session,
+    user_id: int,
+    key: Optional[str],
+    endpoint: str,
+    payload: dict,
+    handler: Callable[[], dict],
+    cacheable: Callable[[dict], bool] = lambda result: True,
+):
+    """Run `handler` at most once per (user, Idempotency-Key).
+
+    A replay with the same key and body returns the stored response without
+    running the handler (so no second LLM call or Refinement row). The same
+    key with a different body is a 422; a replay while the first request is
+    still running is a 409. Failed requests release the key so the client can
+    retry, as do results `cacheable` rejects (e.g. cancelled partial work).
+    """
+    if key is None:
+        return handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+
+    _purge_expired(db)
+    request_hash = _request_hash(endpoint, payload)
+    now = datetime.utcnow()
+
+    record = crud.get_idempotency_key(db, user_id, key)
+    if record is not None:
+        expired = record.expires_at < now
+        stale = record.status == "in_progress" and record.created_at < now - timedelta(seconds=STALE_CLAIM_SECONDS)
+        if expired or stale:
+            crud.delete_idempotency_key(db, record)
+            record = None
+
+    if record is None:
+        record = crud.create_idempotency_key(
+            db, user_id, key, endpoint, request_hash,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+        )
+        if record is None:
+            # Lost the race to a concurrent request with the same key
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+    else:
+        if record.request_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if record.status == "completed":
+            return JSONResponse(
+                status_code=record.response_code,
+                content=record.response_body,
+                headers={"Idempotent-Replayed": "true"}
+            )
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+
+    try:
+        result = handler()
+    except BaseException:
+        crud.delete_idempotency_key(db, record)
+        raise
+
+    if cacheable(result):
+        crud.complete_idempotency_key(db, record, 200, result)
+    else:
+        crud.delete_idempotency_key(db, record)
+    return result
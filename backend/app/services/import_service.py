@@ -0,0 +1,195 @@
+# backend/app/services/import_service.py
+import itertools
+import os
+import tempfile
+import zipfile
+from typing import Iterator, Optional, Tuple
+
+import magic
+from docx import Document
+from pptx import Presentation
+from PyPDF2 import PdfReader
+from PyPDF2.errors import PdfReadError
+from sqlalchemy.orm import Session
+
+from app import crud, metrics
+
+# === CONFIG ===
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(25 * 1024 * 1024)))
+# Uploads stay in memory up to this size, then spill to a temp file
+IMPORT_SPOOL_MEMORY_BYTES = int(os.getenv("IMPORT_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+# PDF pages / slides accepted per file
+IMPORT_MAX_PAGES = int(os.getenv("IMPORT_MAX_PAGES", "300"))
+# Sections inserted per flush
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "50"))
+_MAX_TITLE_CHARS = 120
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+PDF_MIME = "application/pdf"
+
+
+class ImportRejected(Exception):
+    """The upload can't be imported; status_code says why (413 too big, 415 wrong type, 422 unreadable)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# === TYPE DETECTION ===
+def detect_type(fileobj) -> str:
+    """MIME type from the file's content (never the client's filename)"""
+    fileobj.seek(0)
+    mime = magic.from_buffer(fileobj.read(4096), mime=True)
+    fileobj.seek(0)
+    if mime in ("application/zip", "application/octet-stream"):
+        # Older libmagic builds report Office files as plain zips
+        try:
+            names = set(zipfile.ZipFile(fileobj).namelist())
+        except zipfile.BadZipFile:
+            names = set()
+        fileobj.seek(0)
+        if "word/document.xml" in names:
+            return DOCX_MIME
+        if "ppt/presentation.xml" in names:
+            return PPTX_MIME
+    return mime
+
+
+# === PARSERS ===
+# Each yields (title, content) per section as soon as it is complete.
+def _short_title(text: str, fallback: str) -> str:
+    text = " ".join(text.split())
+    if not text:
+        return fallback
+    return text if len(text) <= _MAX_TITLE_CHARS else text[:_MAX_TITLE_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+def _parse_docx(fileobj) -> Iterator[Tuple[str, str]]:
+    """New section at every heading; text before the first heading is an introduction"""
+    document = Document(fileobj)
+    title, paragraphs, started = None, [], False
+    for paragraph in document.paragraphs:
+        text = paragraph.text.strip()
+        if not text:
+            continue
+        style = paragraph.style.name if paragraph.style is not None else ""
+        if style.startswith("Heading") or style == "Title":
+            if started:
+                yield _short_title(title or "", "Introduction"), "\n\n".join(paragraphs)
+            title, paragraphs, started = text, [], True
+        else:
+            paragraphs.append(text)
+            started = True
+    if started:
+        yield _short_title(title or "", "Introduction"), "\n\n".join(paragraphs)
+
+
+def _parse_pptx(fileobj) -> Iterator[Tuple[str, str]]:
+    """One section per slide; body text becomes bullets"""
+    presentation = Presentation(fileobj)
+    if len(presentation.slides) > IMPORT_MAX_PAGES:
+        raise ImportRejected(413, f"Presentation has {len(presentation.slides)} slides; the limit is {IMPORT_MAX_PAGES}")
+    for number, slide in enumerate(presentation.slides, 1):
+        title_shape = slide.shapes.title
+        title = title_shape.text_frame.text if title_shape is not None and title_shape.has_text_frame else ""
+        title_id = title_shape.shape_id if title_shape is not None else None
+        bullets = []
+        for shape in slide.shapes:
+            if shape.shape_id == title_id or not shape.has_text_frame:
+                continue
+            for paragraph in shape.text_frame.paragraphs:
+                text = "".join(run.text for run in paragraph.runs).strip()
+                if text:
+                    bullets.append(f"• {text}")
+        yield _short_title(title, f"Slide {number}"), "\n".join(bullets)
+
+
+def _parse_pdf(fileobj) -> Iterator[Tuple[str, str]]:
+    """One section per page; pages are extracted one at a time"""
+    try:
+        reader = PdfReader(fileobj)
+        if reader.is_encrypted:
+            raise ImportRejected(422, "Encrypted PDFs can't be imported")
+        page_count = len(reader.pages)
+    except PdfReadError as e:
+        raise ImportRejected(422, f"Could not read PDF: {str(e)}")
+    if page_count > IMPORT_MAX_PAGES:
+        raise ImportRejected(413, f"PDF has {page_count} pages; the limit is {IMPORT_MAX_PAGES}")
+
+    for number in range(page_count):
+        text = reader.pages[number].extract_text() or ""
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        if not lines:
+            continue
+        # A short first line is usually the page heading
+        if len(lines[0]) <= _MAX_TITLE_CHARS and len(lines) > 1:
+            title, body = lines[0], lines[1:]
+        else:
+            title, body = f"Page {number + 1}", lines
+        yield _short_title(title, f"Page {number + 1}"), "\n".join(body)
+
+
+# mime -> (file kind, project document_type, parser); PDFs become documents
+_PARSERS = {
+    DOCX_MIME: ("docx", "docx", _parse_docx),
+    PPTX_MIME: ("pptx", "pptx", _parse_pptx),
+    PDF_MIME: ("pdf", "docx", _parse_pdf),
+}
+
+
+# === IMPORT ===
+async def spool_upload(chunks) -> tempfile.SpooledTemporaryFile:
+    """Copy an async byte stream into a spooled temp file, enforcing IMPORT_MAX_BYTES"""
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MEMORY_BYTES)
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise ImportRejected(413, f"File is larger than the {IMPORT_MAX_BYTES // (1024 * 1024)} MB import limit")
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    if size == 0:
+        spool.close()
+        raise ImportRejected(422, "Empty upload")
+    spool.seek(0)
+    return spool
+
+
+def import_document(db: Session, user_id: int, fileobj, filename: Optional[str] = None,
+                    title: Optional[str] = None):
+    """Create a project from an uploaded .docx/.pptx/.pdf. Blocking: run it off the event loop."""
+    mime = detect_type(fileobj)
+    if mime not in _PARSERS:
+        raise ImportRejected(415, f"Unsupported file type {mime}; upload a .docx, .pptx or .pdf file")
+    kind, document_type, parse = _PARSERS[mime]
+
+    if not title:
+        title = os.path.splitext(os.path.basename(filename or ""))[0].replace("_", " ").strip() or "Imported document"
+
+    try:
+        with metrics.span(f"import.{kind}"):
+            sections = parse(fileobj)
+            first = next(sections, None)
+            if first is None:
+                raise ImportRejected(422, "The file has no text to import")
+            project = crud.create_imported_project(
+                db, user_id=user_id, title=title, document_type=document_type,
+                sections=itertools.chain([first], sections), batch_size=IMPORT_BATCH_SIZE
+            )
+    except ImportRejected:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"Import failed for {filename or 'upload'}: {str(e)}")
+        raise ImportRejected(422, f"Could not read {kind} file: {str(e)}")
+
+    if project is None:
+        raise ImportRejected(500, "Failed to save imported project")
+    return project
@@ -0,0 +1,222 @@
+# backend/app/services/llm_scheduler.py
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from app import cancellation, metrics
+from app.cancellation import CancellationToken
+
+# === CONFIG ===
+# Concurrent Gemini calls allowed per worker process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# How long a call may wait for a slot before failing
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "120"))
+
+# Lanes, highest priority first. Interactive = single-section generation and
+# refinement the user is waiting on; bulk = generate-all and background work;
+# speculative = pre-generation nobody has asked for yet, only run on spare capacity.
+INTERACTIVE = "interactive"
+BULK = "bulk"
+SPECULATIVE = "speculative"
+LANES = (INTERACTIVE, BULK, SPECULATIVE)
+
+LLM_QUEUE_DEPTH = metrics.register(metrics.Gauge(
+    "llm_queue_depth", "LLM calls waiting for a concurrency slot", ("lane",)
+))
+LLM_ACTIVE_CALLS = metrics.register(metrics.Gauge(
+    "llm_active_calls", "LLM calls currently holding a concurrency slot"
+))
+LLM_QUEUE_WAIT = metrics.register(metrics.Histogram(
+    "llm_queue_wait_seconds", "Time LLM calls spent waiting for a slot", ("lane",)
+))
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class _Caller:
+    __slots__ = ("user_id", "lane", "weight")
+
+    def __init__(self, user_id, lane: str, weight: int):
+        self.user_id = user_id
+        self.lane = lane
+        self.weight = weight
+
+
+class _Ticket:
+    __slots__ = ("caller", "granted")
+
+    def __init__(self, caller: _Caller):
+        self.caller = caller
+        self.granted = False
+
+
+class FairScheduler:
+    """Bounded LLM concurrency shared fairly between users.
+
+    Each lane keeps one FIFO per user and serves users by deficit
+    round-robin: a user's turn grants up to `weight` calls before moving on,
+    so one user's 40-section batch interleaves with everyone else's calls
+    instead of running ahead of them. The interactive lane is always served
+    before the bulk lane, and the bulk lane before the speculative one.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queues = {lane: {} for lane in LANES}        # lane -> user_id -> deque[_Ticket]
+        self._rings = {lane: deque() for lane in LANES}     # lane -> user_ids with queued work, in turn order
+        self._deficits = {lane: {} for lane in LANES}       # lane -> user_id -> remaining grants this turn
+
+    def _enqueue(self, ticket: _Ticket):
+        lane, user_id = ticket.caller.lane, ticket.caller.user_id
+        queue = self._queues[lane].get(user_id)
+        if queue is None:
+            queue = self._queues[lane][user_id] = deque()
+            self._rings[lane].append(user_id)
+        queue.append(ticket)
+        LLM_QUEUE_DEPTH.inc(lane)
+
+    def _remove_user(self, lane: str, user_id):
+        del self._queues[lane][user_id]
+        self._deficits[lane].pop(user_id, None)
+        self._rings[lane].remove(user_id)
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        for lane in LANES:
+            ring = self._rings[lane]
+            if not ring:
+                continue
+            user_id = ring[0]
+            queue = self._queues[lane][user_id]
+            deficits = self._deficits[lane]
+            if deficits.get(user_id, 0) <= 0:
+                deficits[user_id] = queue[0].caller.weight
+
+            ticket = queue.popleft()
+            deficits[user_id] -= 1
+            LLM_QUEUE_DEPTH.dec(lane)
+
+            if not queue:
+                self._remove_user(lane, user_id)
+            elif deficits[user_id] <= 0:
+                ring.rotate(-1)
+            return ticket
+        return None
+
+    def _dispatch(self):
+        granted = False
+        while self._active < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self._active += 1
+            granted = True
+        if granted:
+            LLM_ACTIVE_CALLS.set(self._active)
+            self._cond.notify_all()
+
+    def _cancel(self, ticket: _Ticket):
+        lane, user_id = ticket.caller.lane, ticket.caller.user_id
+        queue = self._queues[lane].get(user_id)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            LLM_QUEUE_DEPTH.dec(lane)
+            if not queue:
+                self._remove_user(lane, user_id)
+
+    def acquire(self, caller: _Caller, timeout: float, cancel_token: CancellationToken = cancellation.NEVER):
+        ticket = _Ticket(caller)
+        started = time.perf_counter()
+        with self._cond:
+            self._enqueue(ticket)
+            self._dispatch()
+            deadline = time.monotonic() + timeout
+            while not ticket.granted:
+                if cancel_token.cancelled:
+                    self._cancel(ticket)
+                    raise cancellation.Cancelled(cancel_token.reason)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._cancel(ticket)
+                    raise QueueTimeout("LLM service is busy, please try again shortly")
+                self._cond.wait(min(remaining, cancel_token.wait_slice()))
+        LLM_QUEUE_WAIT.observe(time.perf_counter() - started, caller.lane)
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and nobody is queued for it"""
+        with self._cond:
+            if self._active >= self.max_concurrency or any(self._rings[lane] for lane in LANES):
+                return False
+            self._active += 1
+            LLM_ACTIVE_CALLS.set(self._active)
+            return True
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            LLM_ACTIVE_CALLS.set(self._active)
+            self._dispatch()
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                "lanes": {
+                    lane: {
+                        "queued": sum(len(queue) for queue in self._queues[lane].values()),
+                        "by_user": {str(user_id): len(queue) for user_id, queue in self._queues[lane].items()},
+                    }
+                    for lane in LANES
+                },
+            }
+
+
+scheduler = FairScheduler(LLM_MAX_CONCURRENCY)
+
+# Who the current LLM work is for; set by routes, read by llm_service
+_current_caller: ContextVar[Optional[_Caller]] = ContextVar("llm_caller", default=None)
+_SYSTEM_CALLER = _Caller(user_id=None, lane=BULK, weight=1)
+
+
+@contextmanager
+def caller(user_id: Optional[int], lane: str = INTERACTIVE, weight: int = 1):
+    """Attribute llm_service calls made inside the block to a user and lane"""
+    token = _current_caller.set(_Caller(user_id, lane, max(1, weight)))
+    try:
+        yield
+    finally:
+        _current_caller.reset(token)
+
+
+def acquire():
+    """Wait for an LLM concurrency slot for the current caller.
+
+    Gives up early if the current request is cancelled. Pair with release().
+    """
+    scheduler.acquire(_current_caller.get() or _SYSTEM_CALLER, LLM_QUEUE_TIMEOUT_SECONDS, cancellation.current())
+
+
+def try_acquire() -> bool:
+    """Spare slot for optional work (hedged requests); never queues"""
+    return scheduler.try_acquire()
+
+
+def release():
+    scheduler.release()
+
+
+def current_lane() -> str:
+    return (_current_caller.get() or _SYSTEM_CALLER).lane
+
+
+def get_stats() -> dict:
+    return scheduler.get_stats()
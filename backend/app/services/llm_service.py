@@ -1,7 +1,15 @@
 # backend/app/services/llm_service.py
 import google.generativeai as genai
 import os
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
 from dotenv import load_dotenv
+from app import metrics
+from app import cancellation
+from app.services import llm_scheduler, model_router
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
 
@@ -12,8 +20,137 @@ if not api_key:
 
 genai.configure(api_key=api_key)
 
-# Use gemini-1.5-flash (fast, reliable, and fully available)
-model = genai.GenerativeModel("gemini-1.5-flash")
+# One model per tier; model_router decides which tier serves each call
+models = {tier: genai.GenerativeModel(name) for tier, name in model_router.TIERS.items()}
+
+# Runs the blocking SDK calls; sized to the scheduler so a slot always has a thread
+_model_pool = ThreadPoolExecutor(max_workers=llm_scheduler.LLM_MAX_CONCURRENCY, thread_name_prefix="gemini")
+
+# Usage records for the caller currently tracking LLM calls (see
+# usage_service.track_usage); None when nobody is listening
+usage_log: ContextVar[Optional[list]] = ContextVar("llm_usage_log", default=None)
+
+
+class FragmentParseError(ValueError):
+    """The model's answer to refine_fragments didn't come back as marked fragments"""
+
+
+def _estimate_tokens(text: str) -> int:
+    """~4 characters per token, used when the SDK returns no usage metadata"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def log_usage(operation: str, model_name: str, prompt: str, output: Optional[str], response=None,
+              latency: float = 0.0, cache_status: str = "miss", success: bool = True):
+    """Append a usage record for the current tracker, if any"""
+    log = usage_log.get()
+    if log is None:
+        return
+
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata:
+        prompt_tokens = metadata.prompt_token_count
+        output_tokens = metadata.candidates_token_count
+        estimated = False
+    else:
+        prompt_tokens = _estimate_tokens(prompt) if cache_status == "miss" else 0
+        output_tokens = _estimate_tokens(output) if cache_status == "miss" else 0
+        estimated = cache_status == "miss"
+
+    log.append({
+        "operation": operation,
+        "model": model_name,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "tokens_estimated": estimated,
+        "latency_ms": int(latency * 1000),
+        "cache_status": cache_status,
+        "success": success,
+    })
+
+
+def _submit(tier: str, prompt: str):
+    """Start a model call on _model_pool; the caller must already hold a scheduler slot.
+
+    The slot is released and the outcome fed to the tier's circuit breaker
+    when the call finishes, even if nobody is waiting for it any more.
+    """
+    started = time.perf_counter()
+    try:
+        future = _model_pool.submit(models[tier].generate_content, prompt)
+    except Exception:
+        llm_scheduler.release()
+        model_router.abandon(tier)
+        raise
+
+    def finished(f):
+        llm_scheduler.release()
+        model_router.record(tier, time.perf_counter() - started, f.exception() is None)
+
+    future.add_done_callback(finished)
+    return future
+
+
+def _generate(operation: str, prompt: str, tier: str) -> str:
+    """Single model call: routed, fairly scheduled, cancellable, timed, usage-logged.
+
+    The SDK call cannot be interrupted, so it runs on _model_pool while this
+    thread waits on the request's cancellation token. A cancelled request
+    stops waiting immediately; abandoned calls keep their scheduler slot
+    until Gemini answers so the concurrency budget stays honest.
+
+    Latency-critical calls still running after the tier's p95 get one hedged
+    duplicate (only if a slot is free right away); the first success wins.
+    """
+    cancel_token = cancellation.current()
+    cancel_token.raise_if_cancelled()
+    # Slot first: choose() may hand out the breaker's half-open probe, which
+    # must not be lost if queueing times out or the request is cancelled
+    llm_scheduler.acquire()
+    tier = model_router.choose(tier)
+
+    started = time.perf_counter()
+    pending = {_submit(tier, prompt): "primary"}
+    hedge_after = model_router.hedge_delay(tier, llm_scheduler.current_lane())
+    hedged = False
+
+    response = None
+    text = None
+    winner = None
+    try:
+        with metrics.span(f"llm.{operation}"):
+            error = None
+            while pending:
+                done = cancel_token.wait_first(pending, timeout=hedge_after)
+                if not done:
+                    hedge_after = None
+                    if llm_scheduler.try_acquire():
+                        pending[_submit(tier, prompt)] = "hedge"
+                        hedged = True
+                    continue
+                for future in done:
+                    copy = pending.pop(future)
+                    if future.exception() is None and winner is None:
+                        response, winner = future.result(), copy
+                    elif error is None:
+                        error = future.exception()
+                if winner is not None:
+                    break
+            if winner is None:
+                raise error
+        text = response.text.strip()
+        if hedged:
+            model_router.record_hedge(tier, winner)
+        return text
+    finally:
+        latency = time.perf_counter() - started
+        log_usage(
+            operation, model_router.TIERS[tier], prompt, text, response,
+            latency=latency, success=text is not None
+        )
+        # Copies still running are paid for too; their output is unknown
+        for _ in pending:
+            log_usage(operation, model_router.TIERS[tier], prompt, None, latency=latency, success=False)
 
 
 def generate_section_content(topic: str, section_title: str, document_type: str, context: str = "") -> str:
@@ -54,9 +191,10 @@ Requirements:
 Generate the content now:
 """
 
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return _generate("generate_section_content", prompt, model_router.tier_for("generate_section_content"))
 
+    except cancellation.Cancelled:
+        raise
     except Exception as e:
         print(f"Error in generate_section_content: {str(e)}")
         raise Exception(f"Failed to generate content: {str(e)}")
@@ -82,14 +220,61 @@ Requirements:
 Refined content:
 """
 
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return _generate("refine_content", prompt, model_router.tier_for("refine_content", len(original_content)))
 
+    except cancellation.Cancelled:
+        raise
     except Exception as e:
         print(f"Error in refine_content: {str(e)}")
         raise Exception(f"Failed to refine content: {str(e)}")
 
 
+def refine_fragments(fragments: list, refinement_prompt: str, document_type: str,
+                     before: str = "", after: str = "") -> list:
+    """Refine only some paragraphs/bullets of a section.
+
+    Sends just the target fragments plus the block either side for context,
+    and returns one refined fragment per input fragment.
+    """
+    try:
+        unit = "paragraph" if document_type == "docx" else "bullet point"
+        numbered = "\n\n".join(f"[[{i}]]\n{fragment}" for i, fragment in enumerate(fragments, 1))
+        prompt = f"""
+You are a professional content editor. Edit only the marked {unit}s below.
+
+{f"Text just before (context only, do not edit):{chr(10)}{before}{chr(10)}" if before else ""}
+{numbered}
+
+{f"Text just after (context only, do not edit):{chr(10)}{after}{chr(10)}" if after else ""}
+User's Request: {refinement_prompt}
+
+Requirements:
+- Follow the user's instructions exactly
+- Return every marked {unit} in order, each starting with its marker on its own line ([[1]], [[2]], ...)
+- Each {unit} stays a single {unit}
+- Maintain professional tone
+- No explanations
+
+Edited {unit}s:
+"""
+
+        text = _generate(
+            "refine_fragments", prompt,
+            model_router.tier_for("refine_content", sum(len(f) for f in fragments))
+        )
+        parts = re.split(r"^\s*\[\[(\d+)\]\]\s*$", text, flags=re.M)
+        refined = {int(number): body.strip() for number, body in zip(parts[1::2], parts[2::2])}
+        if sorted(refined) != list(range(1, len(fragments) + 1)) or not all(refined.values()):
+            raise FragmentParseError(f"expected {len(fragments)} marked fragments, got {sorted(refined)}")
+        return [refined[i] for i in range(1, len(fragments) + 1)]
+
+    except (cancellation.Cancelled, FragmentParseError):
+        raise
+    except Exception as e:
+        print(f"Error in refine_fragments: {str(e)}")
+        raise Exception(f"Failed to refine fragments: {str(e)}")
+
+
 def generate_document_outline(topic: str, document_type: str, num_sections: int = 5) -> list:
     """Generate section/slide titles for a document or presentation"""
     try:
@@ -124,10 +309,12 @@ Requirements:
 Slide titles:
 """
 
-        response = model.generate_content(prompt)
-        lines = [line.strip() for line in response.text.strip().split("\n") if line.strip()]
+        text = _generate("generate_document_outline", prompt, model_router.tier_for("generate_document_outline"))
+        lines = [line.strip() for line in text.split("\n") if line.strip()]
         return lines[:num_sections]
 
+    except cancellation.Cancelled:
+        raise
     except Exception as e:
         print(f"Error in generate_document_outline: {str(e)}")
         raise Exception(f"Failed to generate outline: {str(e)}")
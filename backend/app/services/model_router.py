@@ -0,0 +1,216 @@
+# backend/app/services/model_router.py
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from app import metrics
+from app.services import llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# Model tiers. Lite is the cheap/fast model for short outputs; standard writes sections.
+LITE = "lite"
+STANDARD = "standard"
+TIERS = {
+    LITE: os.getenv("LLM_MODEL_LITE", "gemini-1.5-flash-8b"),
+    STANDARD: os.getenv("LLM_MODEL_STANDARD", "gemini-1.5-flash"),
+}
+# Where a tier's traffic goes while its circuit breaker is open
+FALLBACK_TIER = {LITE: STANDARD, STANDARD: LITE}
+
+# Refinements of content up to this size are routed to the lite tier
+LLM_SHORT_REFINE_CHARS = int(os.getenv("LLM_SHORT_REFINE_CHARS", "1200"))
+
+# Hedging: "off", "interactive" (latency-critical calls only) or "all"
+LLM_HEDGING = os.getenv("LLM_HEDGING", "interactive").lower()
+# Hedge once a call has run longer than the tier's observed p95 (never sooner than this)
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+# Until enough samples exist, hedge after this long
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "8.0"))
+_LATENCY_WINDOW = 200
+_MIN_SAMPLES = 20
+
+# Circuit breaker: open after this many consecutive failures (errors, or calls
+# slower than LLM_BREAKER_SLOW_SECONDS), probe again after the cooldown
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "30"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+# A half-open probe that hasn't reported back by then is forgotten and another one is let through
+LLM_BREAKER_PROBE_TIMEOUT_SECONDS = float(os.getenv("LLM_BREAKER_PROBE_TIMEOUT_SECONDS", "60"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+LLM_BREAKER_STATE = metrics.register(metrics.Gauge(
+    "llm_breaker_state", "Circuit breaker state per model tier (0 closed, 1 half-open, 2 open)", ("tier",)
+))
+LLM_HEDGES = metrics.register(metrics.Counter(
+    "llm_hedges_total", "Hedged LLM requests sent, by tier and which copy won", ("tier", "winner")
+))
+LLM_FAILOVERS = metrics.register(metrics.Counter(
+    "llm_failovers_total", "LLM calls routed to a fallback tier because the primary breaker was open", ("tier",)
+))
+
+
+class _LatencyWindow:
+    """Latencies of the most recent successful calls to one tier"""
+
+    def __init__(self, size: int):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < _MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    def __init__(self, tier: str, failure_threshold: int, cooldown: float, probe_timeout: float):
+        self.tier = tier
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+        LLM_BREAKER_STATE.set(0, tier)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"LLM circuit breaker for {self.tier} tier: {self.state} -> {state}")
+            self.state = state
+            LLM_BREAKER_STATE.set(_STATE_VALUES[state], self.tier)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._set_state(HALF_OPEN)
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                now = time.monotonic()
+                if not self._probing or now - self._probe_started >= self.probe_timeout:
+                    self._probing = True
+                    self._probe_started = now
+                    return True
+            return False
+
+    def abandon(self):
+        """The call allow() let through never went out; free the probe slot"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                self._failures = 0
+                self._probing = False
+                self._set_state(CLOSED)
+                return
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+
+_breakers = {
+    tier: CircuitBreaker(tier, LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN_SECONDS, LLM_BREAKER_PROBE_TIMEOUT_SECONDS)
+    for tier in TIERS
+}
+_latencies = {tier: _LatencyWindow(_LATENCY_WINDOW) for tier in TIERS}
+
+
+# === ROUTING POLICY ===
+def tier_for(operation: str, content_chars: int = 0) -> str:
+    """Model tier for an llm_service operation"""
+    if operation == "generate_document_outline":
+        return LITE
+    if operation == "refine_content" and content_chars <= LLM_SHORT_REFINE_CHARS:
+        return LITE
+    return STANDARD
+
+
+def choose(tier: str) -> str:
+    """Tier to actually call: the requested one unless its breaker is open.
+
+    If both breakers are open the requested tier is tried anyway; failing
+    fast on every call would only turn a degraded model into an outage.
+    """
+    if _breakers[tier].allow():
+        return tier
+    fallback = FALLBACK_TIER[tier]
+    if _breakers[fallback].allow():
+        LLM_FAILOVERS.inc(fallback)
+        return fallback
+    return tier
+
+
+def record(tier: str, latency: float, ok: bool):
+    """Outcome of a finished call, successful or not"""
+    slow = latency >= LLM_BREAKER_SLOW_SECONDS
+    _breakers[tier].record(ok and not slow)
+    if ok:
+        _latencies[tier].record(latency)
+
+
+def abandon(tier: str):
+    """A tier returned by choose() that was never called"""
+    _breakers[tier].abandon()
+
+
+def hedge_delay(tier: str, lane: str) -> Optional[float]:
+    """Seconds to wait before sending a hedged duplicate, or None for no hedge"""
+    if LLM_HEDGING == "off" or (LLM_HEDGING == "interactive" and lane != llm_scheduler.INTERACTIVE):
+        return None
+    p95 = _latencies[tier].percentile(95)
+    if p95 is None:
+        return LLM_HEDGE_DEFAULT_DELAY_SECONDS
+    return max(LLM_HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+def record_hedge(tier: str, winner: str):
+    LLM_HEDGES.inc(tier, winner)
+
+
+def get_stats() -> dict:
+    return {
+        "hedging": LLM_HEDGING,
+        "tiers": {
+            tier: {
+                "model": TIERS[tier],
+                "fallback": FALLBACK_TIER[tier],
+                "breaker": _breakers[tier].state,
+                "samples": len(_latencies[tier]),
+                "p50_ms": _ms(_latencies[tier].percentile(50)),
+                "p95_ms": _ms(_latencies[tier].percentile(95)),
+            }
+            for tier in TIERS
+        },
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[int]:
+    return None if seconds is None else int(seconds * 1000)
@@ -0,0 +1,179 @@
+# backend/app/services/outline_cache.py
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Optional
+
+from app.services import llm_service, model_router
+
+# === CONFIG ===
+OUTLINE_CACHE_MAX_ENTRIES = int(os.getenv("OUTLINE_CACHE_MAX_ENTRIES", "5000"))
+# Outlines older than this are regenerated (callers can also ask for fresh ones)
+OUTLINE_CACHE_MAX_AGE_SECONDS = int(os.getenv("OUTLINE_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+# Estimated Jaccard similarity of topic shingles needed to offer another topic's outline
+OUTLINE_SIMILARITY_THRESHOLD = float(os.getenv("OUTLINE_SIMILARITY_THRESHOLD", "0.8"))
+
+# MinHash signature = _BANDS x _ROWS values; LSH puts topics sharing any band in
+# the same bucket. 16x4 makes ~0.8-similar topics collide with high probability.
+_BANDS = 16
+_ROWS = 4
+_NUM_PERM = _BANDS * _ROWS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)  # fixed so signatures are comparable across restarts
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(_NUM_PERM)]
+
+EXACT = "exact"
+SIMILAR = "similar"
+
+
+def normalise_topic(topic: str) -> str:
+    """'Introduction to  Machine-Learning!' -> 'introduction to machine learning'"""
+    return " ".join(re.sub(r"[^\w\s]", " ", topic.lower()).split())
+
+
+def _shingles(text: str) -> set:
+    # Character trigrams of the padded topic; robust to plurals and small typos
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} or {padded}
+
+
+def _signature(text: str) -> tuple:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+              for s in _shingles(text)]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _similarity(sig_a: tuple, sig_b: tuple) -> float:
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / _NUM_PERM
+
+
+class _Entry:
+    __slots__ = ("topic", "sections", "created_at", "signature")
+
+    def __init__(self, topic: str, sections: list, signature: tuple):
+        self.topic = topic
+        self.sections = sections
+        self.created_at = time.time()
+        self.signature = signature
+
+
+class OutlineCache:
+    """LRU of generated outlines keyed by (normalised topic, document type,
+    section count), with a MinHash LSH index over topics for near-duplicates"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()     # key -> _Entry
+        self._buckets = defaultdict(set)  # (document_type, num_sections, band, band hash) -> keys
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0}
+
+    def _band_keys(self, key: tuple, signature: tuple):
+        _, document_type, num_sections = key
+        for band in range(_BANDS):
+            yield (document_type, num_sections, band, signature[band * _ROWS:(band + 1) * _ROWS])
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key)
+        for band_key in self._band_keys(key, entry.signature):
+            bucket = self._buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def _fresh(self, entry: _Entry, max_age: float) -> bool:
+        return time.time() - entry.created_at <= max_age
+
+    def lookup(self, topic: str, document_type: str, num_sections: int,
+               max_age: float, allow_similar: bool = True) -> Optional[tuple]:
+        """(entry, EXACT | SIMILAR) for the best fresh match, or None"""
+        normalised = normalise_topic(topic)
+        key = (normalised, document_type, num_sections)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry, max_age):
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry, EXACT
+
+            if allow_similar:
+                signature = _signature(normalised)
+                candidates = set()
+                for band_key in self._band_keys(key, signature):
+                    candidates |= self._buckets.get(band_key, set())
+                best, best_score = None, OUTLINE_SIMILARITY_THRESHOLD
+                for candidate in candidates:
+                    other = self._entries[candidate]
+                    score = _similarity(signature, other.signature)
+                    if score >= best_score and self._fresh(other, max_age):
+                        best, best_score = candidate, score
+                if best is not None:
+                    self._entries.move_to_end(best)
+                    self.stats["similar_hits"] += 1
+                    return self._entries[best], SIMILAR
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, topic: str, document_type: str, num_sections: int, sections: list):
+        normalised = normalise_topic(topic)
+        key = (normalised, document_type, num_sections)
+        entry = _Entry(topic, sections, _signature(normalised))
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            for band_key in self._band_keys(key, entry.signature):
+                self._buckets[band_key].add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self.stats["stores"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "size": len(self._entries), "max_entries": self.max_entries}
+
+
+cache = OutlineCache(OUTLINE_CACHE_MAX_ENTRIES)
+
+
+def get_outline(topic: str, document_type: str, num_sections: int = 5,
+                fresh: bool = False, allow_similar: bool = True,
+                on_miss: Optional[Callable[[], None]] = None) -> dict:
+    """Outline for a topic, reusing a cached one when possible.
+
+    `fresh=True` always calls the model (and refreshes the cache);
+    `allow_similar=False` only accepts exact matches of the normalised topic.
+    `on_miss` runs just before the model is called (quota checks), so cache
+    hits stay free. The cache is shared by all users: responses never say
+    which topic an outline was generated for.
+    """
+    if not fresh:
+        hit = cache.lookup(topic, document_type, num_sections, OUTLINE_CACHE_MAX_AGE_SECONDS, allow_similar)
+        if hit is not None:
+            entry, match = hit
+            llm_service.log_usage(
+                "generate_document_outline",
+                model_router.TIERS[model_router.tier_for("generate_document_outline")],
+                topic, "\n".join(entry.sections), cache_status="hit"
+            )
+            return {
+                "sections": list(entry.sections),
+                "cached": match,
+                "age_seconds": int(time.time() - entry.created_at),
+            }
+
+    if on_miss is not None:
+        on_miss()
+    sections = llm_service.generate_document_outline(topic, document_type, num_sections)
+    if sections:
+        cache.store(topic, document_type, num_sections, sections)
+    return {"sections": sections, "cached": None, "age_seconds": 0}
+
+
+def get_stats() -> dict:
+    return cache.get_stats()
@@ -0,0 +1,126 @@
+# backend/app/services/partial_refinement.py
+# Splits section content into blocks (docx paragraphs / pptx bullets) and
+# splices refined blocks back. Blocks are numbered from 1, the way users talk
+# about them ("the second paragraph"), skipping empty blocks left by leading or
+# trailing separators; separators are kept verbatim so untouched blocks come
+# back byte-for-byte identical.
+import re
+from typing import List, Optional
+
+_ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+    "1st": 1, "2nd": 2, "3rd": 3, "4th": 4, "5th": 5,
+    "6th": 6, "7th": 7, "8th": 8, "9th": 9, "10th": 10,
+}
+_UNIT = r"(?:paragraph|para|bullet|point|item|line)s?"
+_ORDINAL = r"(first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|\d+(?:st|nd|rd|th)|last)"
+# "second and last paragraphs", "the third bullet"
+_ORDINAL_TARGETS = re.compile(rf"\b{_ORDINAL}(?:\s*(?:,|and|&)\s*{_ORDINAL})*\s+{_UNIT}\b", re.I)
+# "paragraph 2", "bullets 1 and 3"
+_NUMBERED_TARGETS = re.compile(rf"\b{_UNIT}\s+(\d+(?:\s*(?:,|and|&)\s*\d+)*)\b", re.I)
+# "keep the first paragraph but tighten the rest", "shorten all bullets except
+# the last" are about the whole section. Phrases only: "keep the tone" isn't.
+_WHOLE_SECTION_HINTS = re.compile(
+    rf"\b(?:the\s+rest|the\s+others|other\s+{_UNIT}|except"
+    rf"|(?:all|every|each)\s+(?:of\s+)?(?:the\s+)?{_UNIT}"
+    rf"|(?:whole|entire)\s+(?:section|text|slide|thing)"
+    rf"|keep\s+(?:the\s+)?{_ORDINAL}(?:\s*(?:,|and|&)\s*{_ORDINAL})*\s+{_UNIT})\b",
+    re.I
+)
+
+
+def _separator(document_type: str) -> str:
+    # docx paragraphs are separated by blank lines, pptx bullets by newlines
+    return r"(\n[ \t]*\n\s*)" if document_type == "docx" else r"(\n\s*)"
+
+
+def split_blocks(content: str, document_type: str) -> tuple:
+    """(blocks, separators) with len(separators) == len(blocks) - 1"""
+    parts = re.split(_separator(document_type), content)
+    return parts[0::2], parts[1::2]
+
+
+def _numbered(blocks: List[str]) -> List[int]:
+    """Indexes into `blocks` of block 1, 2, ... (blocks with text only)"""
+    return [i for i, block in enumerate(blocks) if block.strip()]
+
+
+def join_blocks(blocks: List[str], separators: List[str]) -> str:
+    out = [blocks[0]]
+    for separator, block in zip(separators, blocks[1:]):
+        out.append(separator)
+        out.append(block)
+    return "".join(out)
+
+
+def detect_targets(prompt: str, block_count: int) -> List[int]:
+    """1-based block numbers a refinement prompt refers to, or [] if none.
+
+    Only understands explicit references ("second paragraph", "bullet 3",
+    "first and last points"); anything vaguer is a whole-section refinement.
+    """
+    if _WHOLE_SECTION_HINTS.search(prompt):
+        return []
+    targets = set()
+    for match in _ORDINAL_TARGETS.finditer(prompt):
+        for word in re.findall(_ORDINAL, match.group(0), re.I):
+            word = word.lower()
+            if word == "last":
+                targets.add(block_count)
+            elif word in _ORDINALS:
+                targets.add(_ORDINALS[word])
+            else:
+                targets.add(int(re.match(r"\d+", word).group(0)))
+    for match in _NUMBERED_TARGETS.finditer(prompt):
+        targets.update(int(n) for n in re.findall(r"\d+", match.group(1)))
+    return sorted(targets)
+
+
+def resolve_targets(content: str, document_type: str, prompt: str,
+                    requested: Optional[List[int]] = None) -> List[int]:
+    """Blocks to refine: the explicitly requested ones, else any named in the prompt.
+
+    Returns [] for a whole-section refinement. Raises ValueError for
+    requested block numbers that don't exist.
+    """
+    count = len(_numbered(split_blocks(content, document_type)[0]))
+    if requested:
+        invalid = [n for n in requested if not 1 <= n <= count]
+        if invalid:
+            raise ValueError(f"Section has {count} blocks; cannot refine {invalid}")
+        targets = sorted(set(requested))
+    else:
+        targets = [n for n in detect_targets(prompt, count) if 1 <= n <= count]
+    # Rewriting every block is just a full refinement
+    return targets if len(targets) < count else []
+
+
+def splice(content: str, document_type: str, targets: List[int], fragments: List[str]) -> tuple:
+    """Replace the target blocks with `fragments`.
+
+    Returns (new_content, old_span, new_span); the spans are the target
+    blocks before and after, joined with the section's block separator.
+    """
+    blocks, separators = split_blocks(content, document_type)
+    numbered = _numbered(blocks)
+    joiner = "\n\n" if document_type == "docx" else "\n"
+    old_span = joiner.join(blocks[numbered[n - 1]] for n in targets)
+    for n, fragment in zip(targets, fragments):
+        blocks[numbered[n - 1]] = fragment
+    return join_blocks(blocks, separators), old_span, joiner.join(fragments)
+
+
+def neighbours(content: str, document_type: str, targets: List[int]) -> tuple:
+    """(block before the first target, block after the last), '' at the edges"""
+    blocks, _ = split_blocks(content, document_type)
+    numbered = _numbered(blocks)
+    before = blocks[numbered[targets[0] - 2]] if targets[0] > 1 else ""
+    after = blocks[numbered[targets[-1]]] if targets[-1] < len(numbered) else ""
+    return before, after
+
+
+def target_blocks(content: str, document_type: str, targets: List[int]) -> List[str]:
+    blocks, _ = split_blocks(content, document_type)
+    numbered = _numbered(blocks)
+    return [blocks[numbered[n - 1]] for n in targets]
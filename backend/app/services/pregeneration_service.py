@@ -0,0 +1,89 @@
+# backend/app/services/pregeneration_service.py
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import crud, cancellation, models
+from app.cancellation import CancellationToken
+from app.database import SessionLocal
+from app.services import llm_service, llm_scheduler, usage_service, prompt_builder, generation_state
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# Off by default: speculative calls cost tokens. When on, clients still opt
+# in per project with ?pregenerate=true
+PREGENERATION_ENABLED = os.getenv("PREGENERATION_ENABLED", "false").lower() in ("1", "true", "yes")
+# Projects pre-generated at once per worker (sections within a project run in order)
+PREGENERATION_WORKERS = int(os.getenv("PREGENERATION_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=PREGENERATION_WORKERS, thread_name_prefix="pregenerate")
+_jobs = {}  # project_id -> CancellationToken of the pending/running job
+_jobs_lock = threading.Lock()
+
+
+def schedule(project_id: int, user_id: int):
+    """Queue speculative generation of the project's empty sections"""
+    token = CancellationToken()
+    with _jobs_lock:
+        previous = _jobs.get(project_id)
+        if previous is not None:
+            previous.cancel("superseded")
+        _jobs[project_id] = token
+    _executor.submit(_run, project_id, user_id, token)
+
+
+def cancel(project_id: int, reason: str):
+    """Stop speculative work for a project; a call already at Gemini is discarded"""
+    with _jobs_lock:
+        token = _jobs.pop(project_id, None)
+    if token is not None:
+        token.cancel(reason)
+
+
+def _run(project_id: int, user_id: int, token: CancellationToken):
+    db = SessionLocal()
+    try:
+        with cancellation.scope(token):
+            project = crud.get_project(db, project_id=project_id, user_id=user_id)
+            if not project:
+                return
+            sections = sorted(project.sections, key=models.section_order)
+            outline = prompt_builder.snapshot(sections)
+            for index, section in enumerate(sections):
+                if token.cancelled:
+                    return
+                # Speculative work doesn't claim sections; anything in flight is left alone
+                if generation_state.status_of(section) != generation_state.PENDING:
+                    continue
+                try:
+                    usage_service.check_quota(db, user_id)
+                except usage_service.QuotaExceeded:
+                    return
+
+                with llm_scheduler.caller(user_id, llm_scheduler.SPECULATIVE), \
+                        usage_service.track_usage(db, user_id, project_id, section.id):
+                    content = llm_service.generate_section_content(
+                        topic=project.topic,
+                        section_title=section.title,
+                        document_type=project.document_type,
+                        context=prompt_builder.build_section_context(project, section, sections=outline)
+                    )
+
+                # The user may have generated or edited this section meanwhile
+                db.refresh(section)
+                if token.cancelled or generation_state.status_of(section) != generation_state.PENDING:
+                    continue
+                saved = crud.update_section_content(db, section_id=section.id, content=content, pregenerated=True)
+                if saved is not None:
+                    outline[index] = prompt_builder.SectionInfo(saved.id, saved.title, saved.content, saved.updated_at)
+    except cancellation.Cancelled:
+        pass
+    except Exception as e:
+        logger.warning(f"Pre-generation failed for project {project_id}: {str(e)}")
+    finally:
+        with _jobs_lock:
+            if _jobs.get(project_id) is token:
+                del _jobs[project_id]
+        db.close()
@@ -0,0 +1,132 @@
+# backend/app/services/prompt_builder.py
+import hashlib
+import os
+import re
+from collections import namedtuple
+
+from app import models
+from app.services.cache_service import MemoryBackend
+
+# === CONFIG ===
+# Hard ceiling for the document context added to a section prompt
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "500"))
+# Longest summary kept for one section
+SECTION_SUMMARY_MAX_CHARS = int(os.getenv("SECTION_SUMMARY_MAX_CHARS", "320"))
+SECTION_SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SECTION_SUMMARY_CACHE_MAX_ENTRIES", "5000"))
+_SUMMARY_TTL_SECONDS = 24 * 3600
+
+# Keyed by section id + updated_at, so an edited section is simply a miss
+_summaries = MemoryBackend(SECTION_SUMMARY_CACHE_MAX_ENTRIES)
+
+# What the context needs from a section; a plain snapshot survives commits
+# (which expire ORM objects) in loops that generate one section after another
+SectionInfo = namedtuple("SectionInfo", ("id", "title", "content", "updated_at"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_BULLET = re.compile(r"^\s*(?:[•\-*]|\d+[.)])\s*")
+
+_OUTLINE_HEADER = "Document outline:"
+_SUMMARIES_HEADER = "Summaries of other sections (stay consistent, do not repeat them):"
+
+
+def _tokens(text: str) -> int:
+    """~4 characters per token, as llm_service estimates, rounded up so budgets hold"""
+    return (len(text) + 3) // 4
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(",;:") + "…"
+
+
+# === SECTION SUMMARIES ===
+def _summarise(content: str) -> str:
+    """Extractive summary: lead sentence of each paragraph or bullet, no LLM call"""
+    leads = []
+    for block in re.split(r"\n\s*\n|\n(?=\s*(?:[•\-*]|\d+[.)])\s)", content.strip()):
+        block = _BULLET.sub("", " ".join(block.split()))
+        if block:
+            leads.append(_SENTENCE_END.split(block, 1)[0])
+    return _truncate(" ".join(leads), SECTION_SUMMARY_MAX_CHARS)
+
+
+def section_summary(section) -> str:
+    """Compact summary of a section's content, cached until the section changes"""
+    if not section.content:
+        return ""
+    if section.updated_at is not None:
+        version = section.updated_at.isoformat()
+    else:
+        version = hashlib.sha1(section.content.encode("utf-8")).hexdigest()[:16]
+    key = f"summary:{section.id}:{version}"
+    summary = _summaries.get(key)
+    if summary is None:
+        summary = _summarise(section.content)
+        _summaries.set(key, summary, _SUMMARY_TTL_SECONDS)
+    return summary
+
+
+def snapshot(sections) -> list:
+    """SectionInfo for each section, in document order"""
+    return [SectionInfo(s.id, s.title, s.content, s.updated_at) for s in sorted(sections, key=models.section_order)]
+
+
+# === CONTEXT ===
+def build_section_context(project, section, token_budget: int = PROMPT_CONTEXT_TOKEN_BUDGET,
+                          sections: list = None) -> str:
+    """Document context for generating `section`, within `token_budget` tokens.
+
+    The outline comes first (trimmed to the sections around this one for very
+    long documents), then summaries of the nearest written sections, closest
+    first, until one no longer fits. Callers generating several sections
+    pass a `snapshot()` so the project's sections aren't reloaded each time.
+    """
+    if sections is None:
+        sections = snapshot(project.sections)
+    position = next((i for i, s in enumerate(sections) if s.id == section.id), None)
+    if position is None or len(sections) < 2:
+        return ""
+
+    budget = token_budget - _tokens(_OUTLINE_HEADER) - _tokens(_SUMMARIES_HEADER)
+    outline_lines = [
+        f"{i + 1}. {s.title}" + (" (this section)" if i == position else "")
+        for i, s in enumerate(sections)
+    ]
+    # Keep a window of titles around this section if the full outline is too
+    # big; `chars` tracks the joined window's length as it shrinks
+    low, high = 0, len(outline_lines)
+    chars = sum(len(line) for line in outline_lines) + len(outline_lines) - 1
+    while high - low > 1 and (chars + 3) // 4 > budget // 2:
+        if position - low > high - 1 - position:
+            chars -= len(outline_lines[low]) + 1
+            low += 1
+        else:
+            high -= 1
+            chars -= len(outline_lines[high]) + 1
+    outline = "\n".join(outline_lines[low:high])
+    budget -= _tokens(outline)
+
+    summaries = []
+    full = False
+    for distance in range(1, len(sections)):
+        for index, label in ((position - distance, "Earlier"), (position + distance, "Later")):
+            if not 0 <= index < len(sections) or not sections[index].content:
+                continue
+            prefix = f"- {label} section \"{sections[index].title}\": "
+            room = budget * 4 - len(prefix) - 2  # chars left for the summary (+ newline, "…")
+            if room < 64:  # not worth a clipped one-liner; nearer sections already went in
+                full = True
+                break
+            summary = _truncate(section_summary(sections[index]), room)
+            line = prefix + summary
+            summaries.append((index, line))
+            budget -= _tokens(line + "\n")
+        if full or distance >= max(position, len(sections) - 1 - position):
+            break
+
+    parts = [f"{_OUTLINE_HEADER}\n{outline}"]
+    if summaries:
+        parts.append(_SUMMARIES_HEADER + "\n" + "\n".join(line for _, line in sorted(summaries)))
+    return "\n\n".join(parts)
@@ -0,0 +1,206 @@
+# backend/app/services/search_service.py
+import logging
+import re
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# === POSTGRES ===
+# GIN expression indexes: Postgres keeps them in sync on every write, the
+# search queries below just have to use the exact same expressions.
+PG_PROJECT_DOCUMENT = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(topic, ''))"
+PG_SECTION_DOCUMENT = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))"
+
+PG_SEARCH_SQL = """
+WITH q AS (SELECT plainto_tsquery('english', :query) AS query),
+hits AS (
+    SELECT p.id AS project_id,
+           ts_rank(to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.topic, '')), q.query) AS score
+    FROM projects p, q
+    WHERE p.user_id = :user_id
+      AND to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.topic, '')) @@ q.query
+    UNION ALL
+    SELECT s.project_id AS project_id,
+           ts_rank(to_tsvector('english', coalesce(s.title, '') || ' ' || coalesce(s.content, '')), q.query) AS score
+    FROM sections s JOIN projects p ON p.id = s.project_id, q
+    WHERE p.user_id = :user_id
+      AND to_tsvector('english', coalesce(s.title, '') || ' ' || coalesce(s.content, '')) @@ q.query
+)
+SELECT project_id, sum(score) AS score, count(*) OVER () AS total
+FROM hits
+GROUP BY project_id
+ORDER BY score DESC, project_id
+LIMIT :limit OFFSET :offset
+"""
+
+# === SQLITE ===
+# FTS5 table with one row per project and one per section, maintained
+# incrementally by the mapper events at the bottom of this module. Rowids
+# are derived from the primary key (projects even, sections odd) so every
+# sync is a keyed delete + insert.
+SQLITE_INDEX_TABLE = "search_index"
+
+SQLITE_SEARCH_SQL = f"""
+SELECT project_id, -sum(rank) AS score, count(*) OVER () AS total
+FROM {SQLITE_INDEX_TABLE}
+WHERE {SQLITE_INDEX_TABLE} MATCH :query AND user_id = :user_id
+GROUP BY project_id
+ORDER BY score DESC, project_id
+LIMIT :limit OFFSET :offset
+"""
+
+_sqlite_index_ready = False
+
+
+def ensure_search_index(engine):
+    """Create the full-text index for the current database (idempotent)"""
+    global _sqlite_index_ready
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_projects_fulltext ON projects USING GIN ({PG_PROJECT_DOCUMENT})"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_sections_fulltext ON sections USING GIN ({PG_SECTION_DOCUMENT})"))
+        elif engine.dialect.name == "sqlite":
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": SQLITE_INDEX_TABLE}
+            ).first()
+            if not exists:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {SQLITE_INDEX_TABLE} USING fts5("
+                    "project_id UNINDEXED, user_id UNINDEXED, "
+                    "title, body, tokenize = 'porter unicode61')"
+                ))
+                # Backfill rows written before the index existed
+                conn.execute(text(
+                    f"INSERT INTO {SQLITE_INDEX_TABLE} (rowid, project_id, user_id, title, body) "
+                    "SELECT id * 2, id, user_id, title, topic FROM projects"
+                ))
+                conn.execute(text(
+                    f"INSERT INTO {SQLITE_INDEX_TABLE} (rowid, project_id, user_id, title, body) "
+                    "SELECT sections.id * 2 + 1, sections.project_id, projects.user_id, sections.title, sections.content "
+                    "FROM sections JOIN projects ON projects.id = sections.project_id"
+                ))
+            _sqlite_index_ready = True
+        else:
+            logger.warning(f"Full-text search is not supported on {engine.dialect.name}")
+            return
+
+    logger.info("Search index ready")
+
+
+def mark_index_ready(engine):
+    """Record that a previous boot already created the index (see app/schema.py)"""
+    global _sqlite_index_ready
+    _sqlite_index_ready = engine.dialect.name == "sqlite"
+
+
+def _sqlite_match_query(query: str) -> str:
+    """Turn free text into an FTS5 query that ANDs quoted terms"""
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search_projects(db: Session, user_id: int, query: str, limit: int = 20, offset: int = 0):
+    """Ranked project search over project and section text, scoped to one user.
+
+    Returns (total, [(project, score), ...]) in rank order.
+    """
+    dialect = db.get_bind().dialect.name
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+
+    if dialect == "postgresql":
+        rows = db.execute(text(PG_SEARCH_SQL), {**params, "query": query}).all()
+    elif dialect == "sqlite" and _sqlite_index_ready:
+        match_query = _sqlite_match_query(query)
+        if not match_query:
+            return 0, []
+        rows = db.execute(text(SQLITE_SEARCH_SQL), {**params, "query": match_query}).all()
+    else:
+        return 0, []
+
+    if not rows:
+        return 0, []
+
+    project_ids = [row.project_id for row in rows]
+    projects = db.query(models.Project).filter(models.Project.id.in_(project_ids)).all()
+    projects_by_id = {project.id: project for project in projects}
+
+    results = [
+        (projects_by_id[row.project_id], float(row.score))
+        for row in rows
+        if row.project_id in projects_by_id
+    ]
+    return rows[0].total, results
+
+
+# === INCREMENTAL SQLITE SYNC ===
+def _sqlite_sync_enabled(connection) -> bool:
+    return _sqlite_index_ready and connection.dialect.name == "sqlite"
+
+
+def _project_rowid(project_id: int) -> int:
+    return project_id * 2
+
+
+def _section_rowid(section_id: int) -> int:
+    return section_id * 2 + 1
+
+
+def _delete_index_row(connection, rowid: int):
+    connection.execute(
+        text(f"DELETE FROM {SQLITE_INDEX_TABLE} WHERE rowid = :rowid"),
+        {"rowid": rowid}
+    )
+
+
+def _insert_index_row(connection, rowid: int, project_id: int, user_id: int, title: str, body: str):
+    connection.execute(
+        text(
+            f"INSERT INTO {SQLITE_INDEX_TABLE} (rowid, project_id, user_id, title, body) "
+            "VALUES (:rowid, :project_id, :user_id, :title, :body)"
+        ),
+        {"rowid": rowid, "project_id": project_id, "user_id": user_id, "title": title, "body": body}
+    )
+
+
+@event.listens_for(models.Project, "after_insert")
+@event.listens_for(models.Project, "after_update")
+def _index_project(mapper, connection, project):
+    if not _sqlite_sync_enabled(connection):
+        return
+    rowid = _project_rowid(project.id)
+    _delete_index_row(connection, rowid)
+    _insert_index_row(connection, rowid, project.id, project.user_id, project.title, project.topic)
+
+
+@event.listens_for(models.Project, "after_delete")
+def _unindex_project(mapper, connection, project):
+    if not _sqlite_sync_enabled(connection):
+        return
+    _delete_index_row(connection, _project_rowid(project.id))
+
+
+@event.listens_for(models.Section, "after_insert")
+@event.listens_for(models.Section, "after_update")
+def _index_section(mapper, connection, section):
+    if not _sqlite_sync_enabled(connection):
+        return
+    user_id = connection.execute(
+        text("SELECT user_id FROM projects WHERE id = :project_id"),
+        {"project_id": section.project_id}
+    ).scalar()
+    rowid = _section_rowid(section.id)
+    _delete_index_row(connection, rowid)
+    _insert_index_row(connection, rowid, section.project_id, user_id, section.title, section.content)
+
+
+@event.listens_for(models.Section, "after_delete")
+def _unindex_section(mapper, connection, section):
+    if not _sqlite_sync_enabled(connection):
+        return
+    _delete_index_row(connection, _section_rowid(section.id))
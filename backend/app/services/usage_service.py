@@ -0,0 +1,58 @@
+# backend/app/services/usage_service.py
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.services import llm_service
+
+# Default per-user token allowance over a rolling 24h window; 0 = unlimited.
+# Individual users can be overridden in the llm_quotas table.
+LLM_DAILY_TOKEN_QUOTA = int(os.getenv("LLM_DAILY_TOKEN_QUOTA", "0"))
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def get_quota_status(db: Session, user_id: int) -> dict:
+    quota = crud.get_llm_quota(db, user_id)
+    limit = quota.daily_token_limit if quota and quota.daily_token_limit is not None else LLM_DAILY_TOKEN_QUOTA
+    used = crud.get_user_tokens_since(db, user_id, datetime.utcnow() - timedelta(days=1))
+    return {"daily_token_limit": limit or None, "tokens_used_24h": used}
+
+
+def check_quota(db: Session, user_id: int):
+    """Raise QuotaExceeded before an LLM call if the user is out of tokens"""
+    status = get_quota_status(db, user_id)
+    if status["daily_token_limit"] and status["tokens_used_24h"] >= status["daily_token_limit"]:
+        raise QuotaExceeded(
+            f"Daily LLM token quota of {status['daily_token_limit']} reached, try again later"
+        )
+
+
+@contextmanager
+def collect_usage():
+    """Gather usage records for llm_service calls made inside the block
+    without persisting them (for threads that don't own a DB session)"""
+    records = []
+    token = llm_service.usage_log.set(records)
+    try:
+        yield records
+    finally:
+        llm_service.usage_log.reset(token)
+
+
+@contextmanager
+def track_usage(db: Session, user_id: int, project_id: Optional[int] = None, section_id: Optional[int] = None):
+    """Persist a usage row for every llm_service call made inside the block,
+    including failed ones"""
+    with collect_usage() as records:
+        try:
+            yield records
+        finally:
+            if records:
+                crud.create_llm_usage_records(db, user_id, project_id, section_id, records)
@@ -0,0 +1,55 @@
+# backend/benchmarks/fake_llm.py
+"""Stand-in for the Gemini model so benchmarks never call the real API.
+
+Mimics the shape of google.generativeai responses (``.text`` and
+``.usage_metadata``) and sleeps to simulate model latency.
+"""
+import random
+import re
+import time
+
+
+class _UsageMetadata:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class _Response:
+    def __init__(self, text: str, prompt: str):
+        self.text = text
+        self.usage_metadata = _UsageMetadata(max(1, len(prompt) // 4), max(1, len(text) // 4))
+
+
+class FakeGenerativeModel:
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 400, model_name: str = "models/fake-gemini"):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.model_name = model_name
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        markers = re.findall(r"^\[\[(\d+)\]\]$", prompt, flags=re.M)
+        if markers:
+            # refine_fragments: one marked fragment back per marked input
+            text = "\n\n".join(f"[[{n}]]\nRefined benchmark fragment {n}." for n in markers)
+        elif "titles" in prompt:
+            text = "\n".join(f"Generated Title {i}" for i in range(1, 11))
+        elif "bullet" in prompt:
+            text = "\n".join(f"• Generated point {i} about the topic" for i in range(1, 6))
+        else:
+            paragraph = "This is generated benchmark content for the section. " * 12
+            text = "\n\n".join([paragraph.strip()] * 3)
+        return _Response(text, str(prompt))
+
+
+def install(latency_ms: float = 800, jitter_ms: float = 400):
+    """Point every llm_service model tier at a fake model"""
+    from app.services import llm_service
+
+    llm_service.models = {
+        tier: FakeGenerativeModel(latency_ms=latency_ms, jitter_ms=jitter_ms, model_name=f"models/fake-{tier}")
+        for tier in llm_service.models
+    }
@@ -0,0 +1,264 @@
+# backend/benchmarks/load_test.py
+"""End-to-end load test against one uvicorn worker.
+
+Boots the app in a subprocess against a fresh SQLite database with the fake
+LLM from benchmarks/fake_llm.py, then runs scripted user journeys
+(register -> login -> create project -> generate-all-content -> get project
+-> refine whole section -> refine one paragraph -> export) at ramping
+concurrency. Reports throughput, per-endpoint p50/p95/p99 latency and error
+rates as JSON, tagged with the git commit so runs can be compared across
+changes.
+
+    cd backend && python -m benchmarks.load_test --stages 1,4,16 --stage-seconds 30 --output load.json
+
+Needs httpx (pip install httpx).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# === SERVER ===
+def serve(port: int, llm_latency_ms: float, llm_jitter_ms: float):
+    """Subprocess entry point: fake LLM + single uvicorn worker"""
+    sys.path.insert(0, BACKEND_DIR)
+    import uvicorn
+    from benchmarks import fake_llm
+
+    fake_llm.install(latency_ms=llm_latency_ms, jitter_ms=llm_jitter_ms)
+    from app.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", workers=1)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(args) -> tuple:
+    port = _free_port()
+    db_path = os.path.join(tempfile.mkdtemp(), "load_test.db")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "load-test"),
+    }
+    if args.bcrypt_rounds:
+        env["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.load_test", "--serve",
+            "--port", str(port),
+            "--llm-latency-ms", str(args.llm_latency_ms),
+            "--llm-jitter-ms", str(args.llm_jitter_ms),
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def _wait_until_ready(client, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not come up")
+
+
+# === JOURNEY ===
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.journeys = 0
+        self.failed_journeys = 0
+
+    async def call(self, client, method: str, label: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            response, ok = None, False
+        self.latencies[label].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[label] += 1
+            raise JourneyFailed(label)
+        return response
+
+
+class JourneyFailed(Exception):
+    pass
+
+
+async def run_journey(client, recorder: Recorder, sections: int, document_type: str):
+    name = f"load-{uuid.uuid4().hex[:12]}"
+    password = "load-test-password"
+
+    await recorder.call(client, "POST", "POST /api/auth/register", "/api/auth/register",
+                        json={"username": name, "email": f"{name}@example.com", "password": password})
+    response = await recorder.call(client, "POST", "POST /api/auth/login", "/api/auth/login",
+                                   json={"username": name, "password": password})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await recorder.call(client, "POST", "POST /api/projects/", "/api/projects/", headers=headers, json={
+        "title": f"Load test {name}",
+        "document_type": document_type,
+        "topic": "Capacity planning for document generation services",
+        "structure": {"sections": [f"Section {i}" for i in range(1, sections + 1)]},
+    })
+    project_id = response.json()["id"]
+
+    await recorder.call(client, "POST", "POST /api/documents/generate-all-content/{project_id}",
+                        f"/api/documents/generate-all-content/{project_id}", headers=headers)
+    response = await recorder.call(client, "GET", "GET /api/projects/{project_id}",
+                                   f"/api/projects/{project_id}", headers=headers)
+    section_id = response.json()["sections"][0]["id"]
+
+    await recorder.call(client, "POST", "POST /api/documents/refine-section-content",
+                        "/api/documents/refine-section-content", headers=headers,
+                        json={"section_id": section_id, "prompt": "Make it more concise"})
+    await recorder.call(client, "POST", "POST /api/documents/refine-section-content (partial)",
+                        "/api/documents/refine-section-content", headers=headers,
+                        json={"section_id": section_id, "prompt": "Tighten the second paragraph"})
+    await recorder.call(client, "GET", "GET /api/documents/export/{project_id}",
+                        f"/api/documents/export/{project_id}", headers=headers)
+
+
+# === REPORTING ===
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _summarise(recorder: Recorder, concurrency: int, elapsed: float) -> dict:
+    endpoints = {}
+    total_requests = 0
+    total_errors = 0
+    for label, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        errors = recorder.errors.get(label, 0)
+        total_requests += len(latencies)
+        total_errors += errors
+        endpoints[label] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "error_rate": round(errors / len(latencies), 4),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        }
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "journeys": recorder.journeys,
+        "failed_journeys": recorder.failed_journeys,
+        "requests": total_requests,
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "journeys_per_minute": round(recorder.journeys * 60 / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+async def run_stage(client, concurrency: int, seconds: float, sections: int) -> dict:
+    recorder = Recorder()
+    deadline = time.monotonic() + seconds
+
+    async def virtual_user(index: int):
+        document_type = "pptx" if index % 2 else "docx"
+        while time.monotonic() < deadline:
+            try:
+                await run_journey(client, recorder, sections, document_type)
+            except JourneyFailed:
+                recorder.failed_journeys += 1
+            recorder.journeys += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+    return _summarise(recorder, concurrency, time.perf_counter() - started)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def main(args):
+    import httpx
+
+    process, base_url = _start_server(args)
+    try:
+        limits = httpx.Limits(max_connections=max(args.stages) * 2)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+            await _wait_until_ready(client)
+            stages = []
+            for concurrency in args.stages:
+                print(f"stage: {concurrency} concurrent users for {args.stage_seconds}s", file=sys.stderr)
+                stages.append(await run_stage(client, concurrency, args.stage_seconds, args.sections))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "sections": args.sections,
+            "stage_seconds": args.stage_seconds,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "bcrypt_rounds": args.bcrypt_rounds,
+        },
+        "stages": stages,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test against one uvicorn worker")
+    parser.add_argument("--stages", type=lambda v: [int(x) for x in v.split(",")], default=[1, 2, 4, 8],
+                        help="comma-separated concurrency levels to ramp through")
+    parser.add_argument("--stage-seconds", type=float, default=20)
+    parser.add_argument("--sections", type=int, default=5, help="sections per generated project")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-jitter-ms", type=float, default=400)
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="override BCRYPT_ROUNDS on the server")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.llm_latency_ms, args.llm_jitter_ms)
+    else:
+        asyncio.run(main(args))
@@ -13,6 +13,7 @@ function CreateProject() {
   const [documentType, setDocumentType] = useState('');
   const [topic, setTopic] = useState('');
   const [sections, setSections] = useState(['']);
+  const [pregenerate, setPregenerate] = useState(false);
 
   const handleAddSection = () => {
     setSections([...sections, '']);
@@ -68,7 +69,7 @@ function CreateProject() {
         }
       };
 
-      const response = await projectAPI.create(projectData);
+      const response = await projectAPI.create(projectData, pregenerate);
       navigate(`/project/${response.data.id}`);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to create project');
@@ -317,6 +318,21 @@ function CreateProject() {
                 + Add {documentType === 'docx' ? 'Section' : 'Slide'}
               </button>
 
+              <label className="mt-6 flex items-start space-x-3 cursor-pointer">
+                <input
+                  type="checkbox"
+                  checked={pregenerate}
+                  onChange={(e) => setPregenerate(e.target.checked)}
+                  className="mt-1 h-4 w-4 accent-bronze-500"
+                />
+                <span className="text-sm text-gray-700">
+                  Start writing {documentType === 'docx' ? 'sections' : 'slides'} in the background
+                  <span className="block text-gray-500">
+                    Content is ready sooner, but uses AI credits even for {documentType === 'docx' ? 'sections' : 'slides'} you later change
+                  </span>
+                </span>
+              </label>
+
               <div className="mt-8 flex justify-between">
                 <button
                   onClick={handleBack}
@@ -32,11 +32,16 @@ export const authAPI = {
 
 // Project APIs
 export const projectAPI = {
-  create: (data) => api.post('/api/projects/', data),
+  create: (data, pregenerate = false) => api.post('/api/projects/', data, { params: { pregenerate } }),
   getAll: () => api.get('/api/projects/'),
   getById: (id) => api.get(`/api/projects/${id}`),
   update: (id, data) => api.put(`/api/projects/${id}`, data),
   delete: (id) => api.delete(`/api/projects/${id}`),
+  importDocument: (file, title = null) => api.post('/api/projects/import', file, {
+    params: { filename: file.name, ...(title ? { title } : {}) },
+    headers: { 'Content-Type': 'application/octet-stream' },
+  }),
+  search: (q, params = {}) => api.get('/api/projects/search', { params: { q, ...params } }),
 };
 
 // Document APIs
@@ -47,8 +52,17 @@ export const documentAPI = {
   generateAllContent: (project_id) => 
     api.post(`/api/documents/generate-all-content/${project_id}`),
   
-  refineSectionContent: (section_id, prompt) => 
-    api.post('/api/documents/refine-section-content', { section_id, prompt }),
+  retryFailedContent: (project_id) => 
+    api.post(`/api/documents/retry-failed-content/${project_id}`),
+  
+  generateOutline: (topic, document_type, num_sections = 5, options = {}) => 
+    api.post('/api/documents/generate-outline', { topic, document_type, num_sections, ...options }),
+  
+  refineSectionContent: (section_id, prompt, paragraphs = null) => 
+    api.post('/api/documents/refine-section-content', { section_id, prompt, paragraphs }),
+  
+  bulkRefine: (project_id, prompt, section_ids = null) => 
+    api.post(`/api/documents/bulk-refine/${project_id}`, { prompt, section_ids }),
   
   addFeedback: (section_id, feedback_type, comment = null) => 
     api.post('/api/documents/feedback', { section_id, feedback_type, comment }),